@@ -1,16 +1,179 @@
+import bisect
 import functools
 import itertools
+from collections import Counter
+from math import comb
 from operator import mul
 from pathlib import Path
+from typing import Iterator, Literal, Optional, Sequence, Tuple
 
+SubsetsCount = Tuple[int, Optional[Tuple[int, ...]], int]
 
-def report_repair(expense_report: Path, combinations_length: int) -> None:
+
+def k_sum(values: Sequence[int], k: int, target: int) -> Iterator[Tuple[int, ...]]:
+    """Yields, in lexicographic order, every distinct k-tuple of values (taken from distinct entries) summing to target.
+
+    The values are sorted once, then the first k-2 values are fixed by nested loops and the remaining pair is found
+    with a two-pointer scan, for a complexity of O(n^(k-1)) instead of the O(n^k) of enumerating all combinations.
+
+    Args:
+        values: Values in which to search for the k-tuples.
+        k: Number of values that have to sum to the target.
+        target: Value to which the values have to sum.
+
+    Returns:
+        Iterator over the sorted k-tuples of values summing to the target, each distinct k-tuple appearing only once.
+    """
+    if k < 1:
+        raise ValueError(f"The number of values to sum has to be at least 1, got {k}.")
+    values = sorted(values)
+
+    def search(start: int, k: int, target: int) -> Iterator[Tuple[int, ...]]:
+        if len(values) - start < k:
+            return
+        # Stop early if the target is outside the range of sums reachable with the remaining values
+        if sum(values[start : start + k]) > target or sum(values[-k:]) < target:
+            return
+
+        if k == 1:
+            idx = bisect.bisect_left(values, target, lo=start)
+            if idx < len(values) and values[idx] == target:
+                yield (target,)
+        elif k == 2:
+            lo, hi = start, len(values) - 1
+            while lo < hi:
+                pair_sum = values[lo] + values[hi]
+                if pair_sum < target:
+                    lo += 1
+                elif pair_sum > target:
+                    hi -= 1
+                else:
+                    yield values[lo], values[hi]
+                    # Skip over duplicates of the values in the pair we just found
+                    while lo < hi and values[lo] == values[lo + 1]:
+                        lo += 1
+                    while lo < hi and values[hi] == values[hi - 1]:
+                        hi -= 1
+                    lo += 1
+                    hi -= 1
+        else:
+            for idx in range(start, len(values) - k + 1):
+                if idx > start and values[idx] == values[idx - 1]:
+                    continue  # Skip duplicate values to only yield distinct k-tuples
+                if values[idx] + sum(values[idx + 1 : idx + k]) > target:
+                    break  # Values are sorted, so every later sum will also be too big
+                for vals in search(idx + 1, k - 1, target - values[idx]):
+                    yield (values[idx], *vals)
+
+    return search(0, k, target)
+
+
+def count_k_subsets(
+    values: Sequence[int], k: int, target: int, reconstruct: bool = False
+) -> SubsetsCount:
+    """Counts the k-element subsets of entries whose values sum to target, using a DP over (count, partial sum).
+
+    Entries with the same value are processed together, choosing `j` copies among `m` in `comb(m, j)` ways, so the cost
+    depends on the number of distinct values rather than on the number of entries. Memory is bounded by the
+    (k + 1) x (target + 1) table, since partial sums above the target can never come back down.
+
+    Args:
+        values: Non-negative values from which to pick the subsets.
+        k: Number of entries in each subset.
+        target: Value to which the entries of a subset have to sum.
+        reconstruct: Whether to also reconstruct one of the subsets summing to the target.
+
+    Returns:
+        Exact number of subsets summing to the target, one such subset (or `None` if not requested or if there are
+        none), and number of cells in the DP table.
+    """
+    if any(val < 0 for val in values):
+        raise ValueError(
+            "Counting subsets with a bounded DP table requires non-negative values."
+        )
+    table_size = (k + 1) * (max(target, -1) + 1)
+    if target < 0 or k < 0:
+        return 0, None, table_size
+
+    # `counts[c][s]` is the number of c-element subsets summing to s, and `reachable[c]` is the set of sums reachable
+    # with c elements, represented as a bitset so that it can be snapshotted cheaply to reconstruct a subset afterwards
+    counts = [[1] + [0] * target] + [[0] * (target + 1) for _ in range(k)]
+    reachable = [1] + [0] * k
+    sums_mask = (1 << (target + 1)) - 1
+    reachable_history = []
+    multiplicities = sorted(
+        (val, multiplicity)
+        for val, multiplicity in Counter(values).items()
+        if val <= target
+    )
+    for val, multiplicity in multiplicities:
+        if reconstruct:
+            reachable_history.append(reachable.copy())
+        # Update the counts in decreasing number of elements, so that the smaller counts are still those from before
+        # the current value was considered
+        for c in range(k, 0, -1):
+            row = counts[c]
+            for j in range(1, min(multiplicity, c) + 1):
+                shift = j * val
+                if shift > target:
+                    break
+                coef = comb(multiplicity, j)
+                row[shift:] = [
+                    count + coef * prev_count
+                    for count, prev_count in zip(row[shift:], counts[c - j])
+                ]
+                reachable[c] |= (reachable[c - j] << shift) & sums_mask
+
+    subset = None
+    if reconstruct and counts[k][target]:
+        # Walk back through the values, each time picking a number of copies that leaves a reachable sum
+        subset, c, remainder = [], k, target
+        for (val, multiplicity), prev_reachable in zip(
+            reversed(multiplicities), reversed(reachable_history)
+        ):
+            for j in range(min(multiplicity, c) + 1):
+                if (
+                    j * val <= remainder
+                    and prev_reachable[c - j] >> (remainder - j * val) & 1
+                ):
+                    subset.extend([val] * j)
+                    c, remainder = c - j, remainder - j * val
+                    break
+        subset = tuple(sorted(subset))
+
+    return counts[k][target], subset, table_size
+
+
+def report_repair(
+    expense_report: Path,
+    combinations_length: int,
+    target: int,
+    mode: Literal["search", "count"],
+    first_only: bool,
+    reconstruct: bool,
+) -> None:
     with open(expense_report) as file:
         expense_report_vals = [int(line) for line in file.read().splitlines()]
-    for vals in itertools.combinations(expense_report_vals, combinations_length):
-        if sum(vals) == 2020:
+
+    if mode == "search":
+        solutions = k_sum(expense_report_vals, combinations_length, target)
+        if first_only:
+            solutions = itertools.islice(solutions, 1)
+        for vals in solutions:
+            print(
+                f"Values {vals} sum to {target} and multiplied give {functools.reduce(mul, vals)}"
+            )
+    else:  # mode == "count"
+        num_subsets, subset, table_size = count_k_subsets(
+            expense_report_vals, combinations_length, target, reconstruct=reconstruct
+        )
+        print(
+            f"{num_subsets} combinations of {combinations_length} expenses sum to {target} "
+            f"(DP table of {table_size} cells)."
+        )
+        if subset is not None:
             print(
-                f"Values {vals} sum to 2020 and multiplied give {functools.reduce(mul, vals)}"
+                f"Values {subset} sum to {target} and multiplied give {functools.reduce(mul, subset, 1)}"
             )
 
 
@@ -26,5 +189,35 @@ if __name__ == "__main__":
         type=int,
         help="The length of combinations of expenses to consider",
     )
+    parser.add_argument(
+        "--target",
+        type=int,
+        default=2020,
+        help="The value to which the combinations of expenses have to sum",
+    )
+    parser.add_argument(
+        "--mode",
+        type=str,
+        choices=["search", "count"],
+        default="search",
+        help="Whether to list the distinct combinations that sum to the target, or to count all of them",
+    )
+    parser.add_argument(
+        "--first_only",
+        action="store_true",
+        help="In 'search' mode, whether to stop after finding the first combination that sums to the target",
+    )
+    parser.add_argument(
+        "--reconstruct",
+        action="store_true",
+        help="In 'count' mode, whether to also reconstruct one of the combinations that sum to the target",
+    )
     args = parser.parse_args()
-    report_repair(args.report_path, args.combinations_length)
+    report_repair(
+        args.report_path,
+        args.combinations_length,
+        args.target,
+        args.mode,
+        args.first_only,
+        args.reconstruct,
+    )
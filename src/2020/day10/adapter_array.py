@@ -1,35 +1,65 @@
 import typing
-from collections import Counter
+from collections import Counter, deque
 from pathlib import Path
-from typing import Sequence
+from typing import Iterable, Optional, Sequence, Tuple
 
 
-def compute_joltage_diff_distribution(adapters: Sequence[int]) -> typing.Counter[int]:
-    adapters = list(sorted(adapters))
+def analyze_adapters(
+    adapters: Iterable[int], max_gap: int = 3, modulo: Optional[int] = None
+) -> Tuple[typing.Counter[int], int]:
+    """Computes the distribution of joltage differences and counts the valid arrangements, in a single sorted pass.
+
+    An adapter can only be connected to the adapters at most `max_gap` jolts below it, so the DP over the number of
+    arrangements ending at each adapter only needs a sliding window over these adapters, along with their summed count.
+
+    Args:
+        adapters: Joltages of the adapters, in any order.
+        max_gap: Maximum difference of joltage between two connected adapters.
+        modulo: Modulo under which to count the arrangements, to avoid huge integers.
+
+    Returns:
+        Distribution of the joltage differences between consecutive adapters, and the number of distinct arrangements
+        connecting the lowest adapter to the highest adapter.
+    """
     joltage_diff_distribution = Counter()
-    last = adapters[0]
-    for adapter in adapters[1:]:
-        joltage_diff_distribution[adapter - last] += 1
+    # Joltage of, and number of arrangements ending at, the adapters within reach of the current adapter
+    window = deque()
+    window_arrangements = 0
+    last = None
+    for adapter in sorted(adapters):
+        if last is None:
+            # The lowest adapter starts the chain, so exactly one arrangement ends there
+            arrangements = 1
+        else:
+            joltage_diff_distribution[adapter - last] += 1
+            while window and adapter - window[0][0] > max_gap:
+                window_arrangements -= window.popleft()[1]
+            arrangements = window_arrangements
         last = adapter
-    return joltage_diff_distribution
+
+        if modulo is not None:
+            arrangements %= modulo
+            window_arrangements %= modulo
+        window.append((adapter, arrangements))
+        window_arrangements += arrangements
+
+    return joltage_diff_distribution, window[-1][1] if window else 0
 
 
-def count_valid_arrangements(adapters: Sequence[int]) -> int:
-    adapters = list(sorted(adapters))
+def compute_joltage_diff_distribution(adapters: Sequence[int]) -> typing.Counter[int]:
+    joltage_diff_distribution, _ = analyze_adapters(adapters)
+    return joltage_diff_distribution
 
-    memoization_table = [1]
-    for cur_adapter_pos in range(1, len(adapters)):
-        cur_adapter_valid_arrangements = 0
-        for earlier_adapter_pos in range(cur_adapter_pos):
-            if adapters[cur_adapter_pos] - adapters[earlier_adapter_pos] <= 3:
-                cur_adapter_valid_arrangements += memoization_table[earlier_adapter_pos]
-        memoization_table.append(cur_adapter_valid_arrangements)
 
-    return memoization_table[-1]
+def count_valid_arrangements(
+    adapters: Sequence[int], max_gap: int = 3, modulo: Optional[int] = None
+) -> int:
+    _, num_arrangements = analyze_adapters(adapters, max_gap=max_gap, modulo=modulo)
+    return num_arrangements
 
 
 def adapter_array(
-    adapters_path: Path,
+    adapters_path: Path, max_gap: int = 3, modulo: Optional[int] = None
 ) -> None:
     with open(adapters_path) as file:
         adapters = [int(line) for line in file.read().splitlines()]
@@ -38,16 +68,17 @@ def adapter_array(
         max(adapters) + 3,
     ]  # include the outlet and device built-in adapter in the adapters
 
-    joltage_diffs = compute_joltage_diff_distribution(adapters)
+    joltage_diffs, num_arrangements = analyze_adapters(
+        adapters, max_gap=max_gap, modulo=modulo
+    )
     print(
         "The number of 1-jolt differences multiplied by the number of 3-jolt differences is "
         f"{joltage_diffs[1] * joltage_diffs[3]}."
     )
 
-    num_arrangements = count_valid_arrangements(adapters)
     print(
         f"The total number of distinct ways that the adapters can be arranged to connect the charging outlet to the "
-        f"device is {num_arrangements}."
+        f"device is {num_arrangements}{f' (mod {modulo})' if modulo is not None else ''}."
     )
 
 
@@ -60,5 +91,16 @@ if __name__ == "__main__":
         type=Path,
         help="The path to the adapters joltage data file to read",
     )
+    parser.add_argument(
+        "--max_gap",
+        type=int,
+        default=3,
+        help="The maximum difference of joltage between two connected adapters",
+    )
+    parser.add_argument(
+        "--modulo",
+        type=int,
+        help="The (prime) modulo under which to count the arrangements, to avoid huge integers",
+    )
     args = parser.parse_args()
-    adapter_array(args.adapters_path)
+    adapter_array(args.adapters_path, max_gap=args.max_gap, modulo=args.modulo)
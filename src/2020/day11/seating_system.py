@@ -1,69 +1,214 @@
 import itertools
 from pathlib import Path
-from typing import Literal, Tuple
+from typing import Callable, Literal, NamedTuple, Optional
 
 import numpy as np
 
+# Directions in which seats can see each other
+directions = [
+    (row_dir, col_dir)
+    for row_dir, col_dir in itertools.product((1, 0, -1), repeat=2)
+    if row_dir or col_dir
+]
 
-def apply_one_round(
-    seats_layout: np.ndarray, neighbours: Literal["immediate", "next"]
+
+class SeatsGraph(NamedTuple):
+    """Compressed sparse row (CSR) index of the seats visible from each seat.
+
+    The seats are numbered in row-major order, and the seats visible from seat `i` are
+    `indices[indptr[i] : indptr[i + 1]]`.
+    """
+
+    rows: np.ndarray  # (S,) row of each seat
+    cols: np.ndarray  # (S,) column of each seat
+    indptr: np.ndarray  # (S + 1,) offsets of each seat's neighbours in `indices`
+    indices: np.ndarray  # (E,) visible neighbours of all the seats, grouped by seat
+
+    def neighbours_of(self, seats: np.ndarray) -> np.ndarray:
+        """Concatenates the neighbours of the given seats, without looping over the seats in Python."""
+        starts = self.indptr[seats]
+        degrees = self.indptr[seats + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(degrees) - degrees), degrees)
+        return self.indices[offsets + np.arange(degrees.sum())]
+
+
+def build_seats_graph(seats: np.ndarray) -> SeatsGraph:
+    """Finds the first seat visible in each direction from every seat, to index the seats' neighbours once."""
+    nb_rows, nb_cols = seats.shape
+    rows, cols = np.nonzero(seats)
+    seat_ids = np.full(seats.shape, -1)
+    seat_ids[rows, cols] = np.arange(len(rows))
+
+    visible_seats = np.full((len(rows), len(directions)), -1)
+    for dir_idx, (row_dir, col_dir) in enumerate(directions):
+        # Step along the rays from all seats at once, dropping rays as they hit a seat or leave the layout
+        searching = np.arange(len(rows))
+        ray_rows, ray_cols = rows + row_dir, cols + col_dir
+        while len(searching):
+            is_inside = (
+                (0 <= ray_rows)
+                & (ray_rows < nb_rows)
+                & (0 <= ray_cols)
+                & (ray_cols < nb_cols)
+            )
+            searching = searching[is_inside]
+            ray_rows, ray_cols = ray_rows[is_inside], ray_cols[is_inside]
+            hit_seats = seat_ids[ray_rows, ray_cols]
+            is_hit = hit_seats >= 0
+            visible_seats[searching[is_hit], dir_idx] = hit_seats[is_hit]
+            searching = searching[~is_hit]
+            ray_rows, ray_cols = (
+                ray_rows[~is_hit] + row_dir,
+                ray_cols[~is_hit] + col_dir,
+            )
+
+    has_visible_seat = visible_seats >= 0
+    indptr = np.concatenate(([0], np.cumsum(has_visible_seat.sum(axis=1))))
+    return SeatsGraph(
+        rows, cols, indptr, visible_seats[has_visible_seat].astype(np.int32)
+    )
+
+
+def run_graph_rounds(
+    seats_graph: SeatsGraph,
+    occupied: np.ndarray,
+    neighbour_limit: int = 5,
+    max_rounds: Optional[int] = None,
+    on_round: Optional[Callable[[int, int], None]] = None,
+) -> np.ndarray:
+    """Applies rounds until no seat changes state, only re-evaluating seats whose neighbourhood changed.
+
+    The number of occupied neighbours of each seat is maintained incrementally from the seats that change state. A
+    seat can then only change state in a round if itself or one of its neighbours changed state in the previous round.
+
+    Args:
+        seats_graph: Index of the seats visible from each seat.
+        occupied: (S,) boolean mask of the occupied seats at the start.
+        neighbour_limit: Number of occupied neighbours from which people leave their seat.
+        max_rounds: Maximum number of rounds to apply, since some layouts oscillate forever instead of stabilizing.
+        on_round: Callback called after each round with the index of the round and the number of seats that changed.
+
+    Returns:
+        (S,) boolean mask of the occupied seats once no seat changes state.
+    """
+    num_seats = len(seats_graph.rows)
+    occupied = occupied.copy()
+    occupied_neighbours = np.zeros(num_seats, dtype=np.int32)
+    np.add.at(
+        occupied_neighbours, seats_graph.neighbours_of(np.flatnonzero(occupied)), 1
+    )
+
+    to_update = np.arange(num_seats)
+    to_update_mask = np.zeros(num_seats, dtype=bool)
+    for round_idx in itertools.count() if max_rounds is None else range(max_rounds):
+        # Occupied seats stay occupied below the limit, and empty seats become occupied without any occupied neighbour
+        neighbours_count = occupied_neighbours[to_update]
+        was_occupied = occupied[to_update]
+        is_occupied = np.where(
+            was_occupied, neighbours_count < neighbour_limit, neighbours_count == 0
+        )
+        changed = to_update[is_occupied != was_occupied]
+        if on_round is not None:
+            on_round(round_idx, len(changed))
+        if not len(changed):
+            return occupied
+
+        occupied[changed] = ~occupied[changed]
+        to_update_mask[changed] = True
+        for seats_changed, increment in (
+            (changed[occupied[changed]], np.int32(1)),
+            (changed[~occupied[changed]], np.int32(-1)),
+        ):
+            changed_neighbours = seats_graph.neighbours_of(seats_changed)
+            np.add.at(occupied_neighbours, changed_neighbours, increment)
+            to_update_mask[changed_neighbours] = True
+        to_update = np.flatnonzero(to_update_mask)
+        to_update_mask[to_update] = False
+
+    raise RuntimeError(f"The seats still change state after {max_rounds} rounds.")
+
+
+def run_immediate_rounds(
+    seats: np.ndarray,
+    occupied: np.ndarray,
+    neighbour_limit: int = 4,
+    max_rounds: Optional[int] = None,
 ) -> np.ndarray:
-    nb_rows, nb_cols = seats_layout.shape
-
-    def count_occupied_immediate_neighbours(pos: Tuple[int, int]) -> int:
-        row, col = pos
-        patch = seats_layout[
-            max(0, row - 1) : min(nb_rows, row + 2),
-            max(0, col - 1) : min(nb_cols, col + 2),
-        ]
-        return (patch == "#").sum() - (seats_layout[pos] == "#")
-
-    def count_occupied_next_neighbours(pos: Tuple[int, int]) -> int:
-        row, col = pos
-        nb_occupied_neighbours = 0
-        for row_dir, col_dir in itertools.product((1, 0, -1), repeat=2):
-            if not (row_dir or col_dir):
-                continue
-            neighbour_row, neighbour_col = row + row_dir, col + col_dir
-            while 0 <= neighbour_row < nb_rows and 0 <= neighbour_col < nb_cols:
-                if (neighbour := seats_layout[neighbour_row, neighbour_col]) != ".":
-                    if neighbour == "#":
-                        nb_occupied_neighbours += 1
-                    break
-                neighbour_row += row_dir
-                neighbour_col += col_dir
-        return nb_occupied_neighbours
-
-    neighbour_count_fn = locals()[f"count_occupied_{neighbours}_neighbours"]
-    neighbour_limit = 4 if neighbours == "immediate" else 5
-
-    def update_pos(pos: Tuple[int, int]) -> str:
-        old_pos_val = seats_layout[pos]
-        new_pos_val = old_pos_val
-        occupied_neighbours = neighbour_count_fn(pos)
-        if old_pos_val == "L" and not occupied_neighbours:
-            new_pos_val = "#"
-        elif old_pos_val == "#" and occupied_neighbours >= neighbour_limit:
-            new_pos_val = "L"
-        return new_pos_val
-
-    return np.array(
-        [update_pos(pos) for pos in np.ndindex(seats_layout.shape)]
-    ).reshape(seats_layout.shape)
+    """Applies rounds considering immediate neighbours until no seat changes state, updating the whole layout at once.
+
+    The number of occupied neighbours of every seat is computed as the sum of the 8 shifts of the padded occupancy
+    mask. All the intermediate results are written to buffers allocated once, so that rounds don't allocate memory.
+
+    Args:
+        seats: (H, W) boolean mask of the seats in the layout.
+        occupied: (H, W) boolean mask of the occupied seats at the start.
+        neighbour_limit: Number of occupied neighbours from which people leave their seat.
+        max_rounds: Maximum number of rounds to apply, since some layouts oscillate forever instead of stabilizing.
+
+    Returns:
+        (H, W) boolean mask of the occupied seats once no seat changes state.
+    """
+    nb_rows, nb_cols = seats.shape
+    occupied = occupied.copy()
+    padded_occupied = np.zeros((nb_rows + 2, nb_cols + 2), dtype=np.uint8)
+    occupied_neighbours = np.empty(seats.shape, dtype=np.uint8)
+    is_below_limit = np.empty(seats.shape, dtype=bool)
+    next_occupied = np.empty(seats.shape, dtype=bool)
+    for _ in itertools.count() if max_rounds is None else range(max_rounds):
+        padded_occupied[1:-1, 1:-1] = occupied
+        occupied_neighbours.fill(0)
+        for row_dir, col_dir in directions:
+            np.add(
+                occupied_neighbours,
+                padded_occupied[
+                    1 + row_dir : 1 + row_dir + nb_rows,
+                    1 + col_dir : 1 + col_dir + nb_cols,
+                ],
+                out=occupied_neighbours,
+            )
+
+        # Occupied seats stay occupied below the limit, and empty seats become occupied without any occupied neighbour
+        np.less(occupied_neighbours, neighbour_limit, out=is_below_limit)
+        np.equal(occupied_neighbours, 0, out=next_occupied)
+        np.copyto(next_occupied, is_below_limit, where=occupied)
+        np.logical_and(next_occupied, seats, out=next_occupied)
+
+        # Reuse the buffer of the previous round to find the seats that changed
+        np.not_equal(next_occupied, occupied, out=occupied)
+        if not occupied.any():
+            return next_occupied
+        occupied, next_occupied = next_occupied, occupied
+
+    raise RuntimeError(f"The seats still change state after {max_rounds} rounds.")
 
 
 def seating_system(
-    seats_layout_path: Path, neighbours: Literal["immediate", "next"]
+    seats_layout_path: Path,
+    neighbours: Literal["immediate", "next"],
+    show_rounds: bool = False,
 ) -> None:
     with open(seats_layout_path) as file:
         seats_layout = np.array([[*line] for line in file.read().splitlines()])
 
-    while (
-        (next_layout := apply_one_round(seats_layout, neighbours)) != seats_layout
-    ).any():
-        seats_layout = next_layout
-
-    num_seats_occupied = sum(pos == "#" for row in seats_layout for pos in row)
+    if neighbours == "immediate":
+        occupied = run_immediate_rounds(seats_layout != ".", seats_layout == "#")
+        num_seats_occupied = int(occupied.sum())
+    else:  # neighbours == "next"
+        seats_graph = build_seats_graph(seats_layout != ".")
+        occupied = run_graph_rounds(
+            seats_graph,
+            seats_layout[seats_graph.rows, seats_graph.cols] == "#",
+            on_round=(
+                (
+                    lambda round_idx, num_changed: print(
+                        f"Round {round_idx}: {num_changed} seats changed state."
+                    )
+                )
+                if show_rounds
+                else None
+            ),
+        )
+        num_seats_occupied = int(occupied.sum())
     print(
         f"{num_seats_occupied} seats end up occupied when no more seats change state."
     )
@@ -79,5 +224,10 @@ if __name__ == "__main__":
         help="The path to the seats layout file to read",
     )
     parser.add_argument("neighbours", type=str, choices=["immediate", "next"])
+    parser.add_argument(
+        "--show_rounds",
+        action="store_true",
+        help="In 'next' mode, whether to report the number of seats that changed state in each round",
+    )
     args = parser.parse_args()
-    seating_system(args.seats_layout_path, args.neighbours)
+    seating_system(args.seats_layout_path, args.neighbours, args.show_rounds)
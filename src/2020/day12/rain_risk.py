@@ -1,54 +1,175 @@
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Sequence, Tuple
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
 
-directions = {"N": 1j, "S": -1j, "E": 1, "W": -1}
-rotations = {"R": -1j, "L": 1j}
+from utils.files import Chunk, read_chunk_lines, split_in_chunks
 
+# Gaussian integers, i.e. complex numbers with integer coordinates, represented as (real, imag) pairs so that the
+# coordinates remain exact however far the ship goes
+GaussianInt = Tuple[int, int]
 
-def navigate_ship(
-    navigation_instructions: Sequence[Tuple[str, int]]
-) -> Tuple[int, int]:
-    pos = 0 + 0j
-    direction = 1
+directions = {"N": (0, 1), "S": (0, -1), "E": (1, 0), "W": (-1, 0)}
+# Direction of quarter turns, counter-clockwise being positive
+rotations = {"R": -1, "L": 1}
+
+
+def rotate(vec: GaussianInt, quarter_turns: int) -> GaussianInt:
+    x, y = vec
+    return ((x, y), (-y, x), (-x, -y), (y, -x))[quarter_turns % 4]
+
+
+def mul(x: GaussianInt, y: GaussianInt) -> GaussianInt:
+    return x[0] * y[0] - x[1] * y[1], x[0] * y[1] + x[1] * y[0]
+
+
+def add(x: GaussianInt, y: GaussianInt) -> GaussianInt:
+    return x[0] + y[0], x[1] + y[1]
+
+
+class AffineMap(NamedTuple):
+    """Affine map on the ship's state, made of its position and of a vector (its heading or its waypoint).
+
+    The map sends `(pos, vec)` to `(pos + pos_vec * vec + pos_offset, vec_scale * vec + vec_offset)`.
+    """
+
+    pos_vec: GaussianInt = (0, 0)
+    pos_offset: GaussianInt = (0, 0)
+    vec_scale: GaussianInt = (1, 0)
+    vec_offset: GaussianInt = (0, 0)
+
+    def then(self, other: "AffineMap") -> "AffineMap":
+        """Composes the map with another map, applied after it."""
+        return AffineMap(
+            pos_vec=add(self.pos_vec, mul(other.pos_vec, self.vec_scale)),
+            pos_offset=add(
+                add(self.pos_offset, mul(other.pos_vec, self.vec_offset)),
+                other.pos_offset,
+            ),
+            vec_scale=mul(other.vec_scale, self.vec_scale),
+            vec_offset=add(mul(other.vec_scale, self.vec_offset), other.vec_offset),
+        )
+
+    def apply(
+        self, pos: GaussianInt, vec: GaussianInt
+    ) -> Tuple[GaussianInt, GaussianInt]:
+        return (
+            add(add(pos, mul(self.pos_vec, vec)), self.pos_offset),
+            add(mul(self.vec_scale, vec), self.vec_offset),
+        )
+
+
+def compile_instructions(
+    navigation_instructions: Iterable[Tuple[str, int]], use_waypoint: bool
+) -> AffineMap:
+    """Folds a sequence of navigation instructions into the single affine map they amount to."""
+    (pos_vec_x, pos_vec_y), (pos_offset_x, pos_offset_y) = (0, 0), (0, 0)
+    vec_scale, vec_offset = (1, 0), (0, 0)
     for action, value in navigation_instructions:
         if action in directions:
-            pos += directions[action] * value
+            dir_x, dir_y = directions[action]
+            if use_waypoint:
+                vec_offset = (
+                    vec_offset[0] + dir_x * value,
+                    vec_offset[1] + dir_y * value,
+                )
+            else:
+                pos_offset_x += dir_x * value
+                pos_offset_y += dir_y * value
         elif action in rotations:
-            direction *= rotations[action] ** (value // 90)
+            quarter_turns = rotations[action] * (value // 90)
+            vec_scale = rotate(vec_scale, quarter_turns)
+            vec_offset = rotate(vec_offset, quarter_turns)
         elif action == "F":
-            pos += direction * value
+            pos_vec_x += vec_scale[0] * value
+            pos_vec_y += vec_scale[1] * value
+            pos_offset_x += vec_offset[0] * value
+            pos_offset_y += vec_offset[1] * value
         else:
             raise RuntimeError(f"Invalid action '{action}' encountered.")
-    return int(pos.real), int(pos.imag)
+    return AffineMap(
+        (pos_vec_x, pos_vec_y), (pos_offset_x, pos_offset_y), vec_scale, vec_offset
+    )
+
+
+def parse_instruction(line: str) -> Tuple[str, int]:
+    return line[0], int(line[1:])
+
+
+def compile_chunk(
+    navigation_instructions_path: Path, chunk: Chunk, use_waypoint: bool
+) -> AffineMap:
+    return compile_instructions(
+        map(
+            parse_instruction,
+            filter(None, read_chunk_lines(navigation_instructions_path, chunk)),
+        ),
+        use_waypoint,
+    )
+
+
+def navigate_ship(
+    navigation_instructions: Sequence[Tuple[str, int]],
+) -> Tuple[int, int]:
+    pos, _ = compile_instructions(navigation_instructions, False).apply((0, 0), (1, 0))
+    return pos
 
 
 def navigate_ship_with_waypoint(
-    navigation_instructions: Sequence[Tuple[str, int]]
+    navigation_instructions: Sequence[Tuple[str, int]],
 ) -> Tuple[int, int]:
-    pos = 0 + 0j
-    waypoint = 10 + 1j
-    for action, value in navigation_instructions:
-        if action in directions:
-            waypoint += directions[action] * value
-        elif action in rotations:
-            waypoint *= rotations[action] ** (value // 90)
-        elif action == "F":
-            pos += waypoint * value
-        else:
-            raise RuntimeError(f"Invalid action '{action}' encountered.")
-    return int(pos.real), int(pos.imag)
+    pos, _ = compile_instructions(navigation_instructions, True).apply((0, 0), (10, 1))
+    return pos
+
 
+def navigate_file(
+    navigation_instructions_path: Path,
+    use_waypoint: bool,
+    num_workers: Optional[int] = None,
+    chunk_size: int = 1 << 24,
+) -> Tuple[int, int]:
+    """Navigates following the instructions in a file, as a parallel reduction over chunks of the file.
+
+    Each chunk of the file is compiled to an affine map by a worker process, reading only that chunk. Since composing
+    affine maps is associative, the chunks' maps can then be composed in the order of the file to get the map of the
+    whole navigation.
+
+    Args:
+        navigation_instructions_path: The path to the navigation instructions file to read.
+        use_waypoint: Whether the instructions need to be interpreted relative to a waypoint.
+        num_workers: Number of worker processes. Defaults to the number of CPUs.
+        chunk_size: Approximate size, in bytes, of the chunks of the file compiled by each task.
 
-def rain_risk(navigation_instructions_path: Path, use_waypoint: bool) -> None:
-    with open(navigation_instructions_path) as file:
-        navigation_instructions = [
-            (line[0], int(line[1:])) for line in file.read().splitlines()
-        ]
+    Returns:
+        End location of the ship.
+    """
+    chunks = split_in_chunks(navigation_instructions_path, chunk_size)
+    with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+        chunks_maps = executor.map(
+            functools.partial(
+                compile_chunk, navigation_instructions_path, use_waypoint=use_waypoint
+            ),
+            chunks,
+        )
+        navigation_map = functools.reduce(AffineMap.then, chunks_maps, AffineMap())
 
-    if use_waypoint:
-        pos = navigate_ship_with_waypoint(navigation_instructions)
-    else:
-        pos = navigate_ship(navigation_instructions)
+    pos, _ = navigation_map.apply((0, 0), (10, 1) if use_waypoint else (1, 0))
+    return pos
+
+
+def rain_risk(
+    navigation_instructions_path: Path,
+    use_waypoint: bool,
+    num_workers: Optional[int] = None,
+    chunk_size: int = 1 << 24,
+) -> None:
+    pos = navigate_file(
+        navigation_instructions_path,
+        use_waypoint,
+        num_workers=num_workers,
+        chunk_size=chunk_size,
+    )
     print(
         "The Manhattan distance between the end location and the ship's starting position is "
         f"{sum(abs(axis) for axis in pos)}."
@@ -69,5 +190,21 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether the instructions need to be interpreted relative to a waypoint",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        help="The number of worker processes compiling chunks of instructions. Defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=1 << 24,
+        help="The approximate size (in bytes) of the chunks of instructions compiled by each worker",
+    )
     args = parser.parse_args()
-    rain_risk(args.navigation_instructions_path, args.use_waypoint)
+    rain_risk(
+        args.navigation_instructions_path,
+        args.use_waypoint,
+        num_workers=args.num_workers,
+        chunk_size=args.chunk_size,
+    )
@@ -1,31 +1,89 @@
+import math
+import time
 from pathlib import Path
+from typing import Iterable, List, Tuple
 
-from sympy.ntheory.modular import solve_congruence
+# Congruence `x = residue (mod modulus)`, as a (residue, modulus) pair
+Congruence = Tuple[int, int]
+
+
+def merge_congruences(first: Congruence, second: Congruence) -> Congruence:
+    """Merges two congruences into the single congruence satisfied by exactly the same integers.
+
+    The moduli need not be coprime: the congruences are compatible iff their residues agree modulo the gcd of their
+    moduli, in which case the merged congruence is modulo the lcm of the moduli.
+    """
+    residue, modulus = first
+    other_residue, other_modulus = second
+    gcd = math.gcd(modulus, other_modulus)
+    diff = other_residue - residue
+    if diff % gcd:
+        raise ValueError(
+            f"The congruences x = {residue} (mod {modulus}) and x = {other_residue} (mod {other_modulus}) have no "
+            f"common solution, since their residues differ modulo {gcd}."
+        )
+    reduced_modulus = other_modulus // gcd
+    # Number of `modulus` steps to take from `residue` to also satisfy the second congruence
+    steps = diff // gcd * pow(modulus // gcd, -1, reduced_modulus) % reduced_modulus
+    lcm = modulus * reduced_modulus
+    return (residue + modulus * steps) % lcm, lcm
+
+
+def parse_bus_ids(schedule: str) -> List[Tuple[int, int]]:
+    return [(int(id), rank) for rank, id in enumerate(schedule.split(",")) if id != "x"]
+
+
+def earliest_bus(earliest_timestamp: int, bus_ids: Iterable[int]) -> Tuple[int, int]:
+    bus_wait_times = {
+        bus_id: bus_id - (earliest_timestamp % bus_id) for bus_id in bus_ids
+    }
+    bus_id = min(bus_wait_times, key=bus_wait_times.get)
+    return bus_id, bus_wait_times[bus_id]
+
+
+def earliest_aligned_timestamp(bus_ids: Iterable[Tuple[int, int]]) -> int:
+    """Solves the system of congruences of the buses' departures (generalized CRT), by merging them one bus at a time.
+
+    Args:
+        bus_ids: IDs of the buses, along with their positions in the list.
+
+    Returns:
+        The earliest timestamp such that each bus departs at the offset of its position in the list.
+
+    Raises:
+        ValueError: If a bus can never depart at its offset along with the buses before it, which can only happen if
+            the bus IDs are not coprime.
+    """
+    timestamp, period = 0, 1
+    for bus_id, rank in bus_ids:
+        try:
+            timestamp, period = merge_congruences(
+                (timestamp, period), ((bus_id - rank) % bus_id, bus_id)
+            )
+        except ValueError as error:
+            raise ValueError(
+                f"Bus {bus_id} at position {rank} can never depart at its offset along with the buses listed before "
+                f"it, which all depart at their offsets only at timestamps x = {timestamp} (mod {period})."
+            ) from error
+    return timestamp
 
 
 def shuttle_search(notes_path: Path) -> None:
     with open(notes_path) as file:
         lines = [line for line in file.read().splitlines()]
     earliest_timestamp = int(lines[0])
-    bus_ids = {
-        int(id): rank for rank, id in enumerate(lines[1].split(",")) if id != "x"
-    }
+    bus_ids = parse_bus_ids(lines[1])
 
     # Part one
-    bus_wait_times = {
-        bus_id: bus_id - (earliest_timestamp % bus_id) for bus_id in bus_ids
-    }
-    earliest_bus = min(bus_wait_times, key=bus_wait_times.get)
+    bus_id, wait_time = earliest_bus(earliest_timestamp, (id for id, _ in bus_ids))
 
     print(
         "The ID of the earliest bus we can take to the airport multiplied by the number of minutes we'll need to wait "
-        f"for that bus is {earliest_bus * bus_wait_times[earliest_bus]}."
+        f"for that bus is {bus_id * wait_time}."
     )
 
     # Part two
-    timestamp = solve_congruence(
-        *[(bus_id - rank, bus_id) for bus_id, rank in bus_ids.items()]
-    )[0]
+    timestamp = earliest_aligned_timestamp(bus_ids)
 
     print(
         f"The earliest timestamp such that all of the listed bus IDs depart at offsets matching their positions in the "
@@ -33,14 +91,50 @@ def shuttle_search(notes_path: Path) -> None:
     )
 
 
+def shuttle_search_batch(notes_paths: Iterable[Path]) -> None:
+    """Solves part two for every schedule in many notes files, where each line after the timestamp is a schedule."""
+    num_schedules = 0
+    start = time.perf_counter()
+    for notes_path in notes_paths:
+        with open(notes_path) as file:
+            lines = file.read().splitlines()
+        # Line numbers start at 2, since the first line of the notes holds the earliest timestamp
+        for line_number, schedule in enumerate(lines[1:], start=2):
+            if not schedule:
+                continue
+            try:
+                timestamp = earliest_aligned_timestamp(parse_bus_ids(schedule))
+            except ValueError as error:
+                print(f"{notes_path}:{line_number}: no solution. {error}")
+            else:
+                print(f"{notes_path}:{line_number}: {timestamp}")
+            num_schedules += 1
+    elapsed_time = time.perf_counter() - start
+
+    print(
+        f"Solved {num_schedules} schedules in {elapsed_time:.3f}s "
+        f"({num_schedules / elapsed_time if elapsed_time else 0:.0f} schedules/s)."
+    )
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="AoC 2020 - Day 13: Shuttle Search")
     parser.add_argument(
-        "notes_path",
+        "notes_paths",
         type=Path,
-        help="The path to the notes about the shuttles to read",
+        nargs="+",
+        help="The path(s) to the notes about the shuttles to read",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Whether to only find the earliest aligned timestamp, for every schedule line of every notes file",
     )
     args = parser.parse_args()
-    shuttle_search(args.notes_path)
+    if args.batch:
+        shuttle_search_batch(args.notes_paths)
+    else:
+        for notes_path in args.notes_paths:
+            shuttle_search(notes_path)
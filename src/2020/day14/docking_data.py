@@ -1,78 +1,190 @@
-import itertools
 from pathlib import Path
-from typing import Literal, Mapping, Sequence, Tuple, Union
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Literal,
+    MutableMapping,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-MaskOp = Tuple[Literal["mask"], str]
-MemOp = Tuple[Literal["mem"], str, str]
+ADDRESS_BITS = 36
+
+# Bits kept by an AND (i.e. not forced to 0), bits forced to 1 by an OR, and floating bits (the mask's 'X' bits)
+Mask = Tuple[int, int, int]
+MaskOp = Tuple[Literal["mask"], Mask]
+MemOp = Tuple[Literal["mem"], int, int]
 Op = Union[MaskOp, MemOp]
 Program = Sequence[Op]
-Memory = Mapping[int, int]
+Memory = MutableMapping[int, int]
+Decoder = Callable[[Memory, Mask, int, int], None]
+# Set of addresses matching fixed bits everywhere outside a floating mask, as a (fixed bits, floating mask) pair. The
+# fixed bits are always cleared under the floating mask
+AddressPattern = Tuple[int, int]
 
 
-def decoder_v1(mask: str, address: str, val: str) -> Memory:
-    val = "".join(
-        mask[bit_rank] if is_masked else val[bit_rank]
-        for bit_rank, is_masked in enumerate(bit != "X" for bit in mask)
-    )
-    return {int(address, 2): int(val, 2)}
+def parse_mask(mask: str) -> Mask:
+    if len(mask) != ADDRESS_BITS:
+        raise RuntimeError(
+            f"Masks should be {ADDRESS_BITS} bits long, but got a {len(mask)} bits long mask: {mask}."
+        )
+    and_mask = int(mask.replace("X", "1"), 2)
+    or_mask = int(mask.replace("X", "0"), 2)
+    floating_mask = int(mask.replace("1", "0").replace("X", "1"), 2)
+    return and_mask, or_mask, floating_mask
 
 
-def decoder_v2(mask: str, address: str, val: str) -> Memory:
-    val = int(val, 2)
-    floating_address = "".join(
-        address[bit_rank] if mask_bit == "0" else mask[bit_rank]
-        for bit_rank, mask_bit in enumerate(mask)
-    )
-    floating_bits = [
-        bit_rank for bit_rank, bit in enumerate(floating_address) if bit == "X"
-    ]
-    memory = {}
-    for bit_vals in itertools.product(("0", "1"), repeat=len(floating_bits)):
-        address_bits = list(floating_address)
-        for floating_bit, bit_val in zip(floating_bits, bit_vals):
-            address_bits[floating_bit] = bit_val
-        memory["".join(address_bits)] = val
-    return memory
+def decoder_v1(memory: Memory, mask: Mask, address: int, val: int) -> None:
+    and_mask, or_mask, _ = mask
+    memory[address] = val & and_mask | or_mask
+
+
+def decoder_v2(memory: Memory, mask: Mask, address: int, val: int) -> None:
+    _, or_mask, floating_mask = mask
+    address = (address | or_mask) & ~floating_mask
+    # Enumerate all the subsets of the floating bits, in decreasing order, down to the empty subset
+    floating_bits = floating_mask
+    while True:
+        memory[address | floating_bits] = val
+        if not floating_bits:
+            break
+        floating_bits = (floating_bits - 1) & floating_mask
+
+
+decoders: Dict[str, Decoder] = {"v1": decoder_v1, "v2": decoder_v2}
 
 
 def run_program(initialization_program: Program, decoder_version: str) -> Memory:
+    decoder = decoders[decoder_version]
     memory = {}
+    mask = None
     for op in initialization_program:
-        op_t, *args = op
-        if op_t == "mask":
-            mask = args[0]
-        elif op_t == "mem":
-            address, val = args
-            memory.update(globals()[f"decoder_{decoder_version}"](mask, address, val))
+        if op[0] == "mem":
+            decoder(memory, mask, op[1], op[2])
+        elif op[0] == "mask":
+            mask = op[1]
         else:
             raise RuntimeError(
-                f"Unknown '{op_t}' operation called with parameters: {args}."
+                f"Unknown '{op[0]}' operation called with parameters: {op[1:]}."
             )
     return memory
 
 
-def docking_data(initialization_program_path: Path, decoder_version: str) -> None:
-    def binary_str_36(val: int) -> str:
-        return bin(val)[2:].zfill(36)
+def patterns_intersect(pattern: AddressPattern, other: AddressPattern) -> bool:
+    (fixed, floating), (other_fixed, other_floating) = pattern, other
+    return not (fixed ^ other_fixed) & ~(floating | other_floating)
+
+
+def subtract_pattern(
+    pattern: AddressPattern, other: AddressPattern
+) -> List[AddressPattern]:
+    """Splits the addresses of a pattern that are not in another pattern into disjoint patterns.
+
+    The bits floating in `pattern` but fixed in `other` are fixed one at a time: the addresses where the bit differs
+    from `other` form a piece, and those where it matches are split further on the next bit. At most one piece is
+    created per such bit, and nothing is left once all of them match `other`.
+    """
+    if not patterns_intersect(pattern, other):
+        return [pattern]
+    fixed, floating = pattern
+    other_fixed, other_floating = other
+    pieces = []
+    split_bits = floating & ~other_floating
+    while split_bits:
+        bit = split_bits & -split_bits
+        split_bits ^= bit
+        floating ^= bit
+        pieces.append((fixed | (other_fixed & bit ^ bit), floating))
+        fixed |= other_fixed & bit
+    return pieces
+
+
+def sum_memory_v2(initialization_program: Program) -> Tuple[int, int]:
+    """Sums the values left in memory by version 2 of the decoder chip, without ever expanding floating addresses.
 
+    Writes are processed in reverse, so that the addresses each write still owns at the end are those of its pattern
+    minus the patterns of all later writes. These are tracked as disjoint pieces of the write's pattern.
+
+    Args:
+        initialization_program: Program to run.
+
+    Returns:
+        Sum of all values left in memory, and the peak number of address patterns held at once.
+    """
+    writes = []
+    mask = None
+    for op in initialization_program:
+        if op[0] == "mem":
+            _, or_mask, floating_mask = mask
+            writes.append((((op[1] | or_mask) & ~floating_mask, floating_mask), op[2]))
+        elif op[0] == "mask":
+            mask = op[1]
+        else:
+            raise RuntimeError(
+                f"Unknown '{op[0]}' operation called with parameters: {op[1:]}."
+            )
+
+    total = 0
+    later_patterns = []
+    seen_patterns = set()
+    peak_patterns = 0
+    for pattern, val in reversed(writes):
+        # Fully overwritten by the later write to the same pattern
+        if pattern in seen_patterns:
+            continue
+        if val:
+            pieces = [pattern]
+            for later_pattern in later_patterns:
+                pieces = [
+                    piece
+                    for remaining in pieces
+                    for piece in subtract_pattern(remaining, later_pattern)
+                ]
+                peak_patterns = max(peak_patterns, len(later_patterns) + len(pieces))
+                if not pieces:
+                    break
+            total += val * sum(1 << floating.bit_count() for _, floating in pieces)
+        seen_patterns.add(pattern)
+        later_patterns.append(pattern)
+        peak_patterns = max(peak_patterns, len(later_patterns))
+    return total, peak_patterns
+
+
+def read_initialization_program(initialization_program_path: Path) -> Program:
     with open(initialization_program_path) as file:
         initialization_program = []
         for line_nb, line in enumerate(file.read().splitlines()):
             tokens = line.replace("=", " ").replace("[", " ").replace("]", " ").split()
             if len(tokens) == 2:  # MaskOp
-                initialization_program.append(tokens)
+                initialization_program.append((tokens[0], parse_mask(tokens[1])))
             elif len(tokens) == 3:  # MemOp
-                address = binary_str_36(int(tokens[1]))
-                val = binary_str_36(int(tokens[2]))
-                initialization_program.append((tokens[0], address, val))
+                initialization_program.append(
+                    (tokens[0], int(tokens[1]), int(tokens[2]))
+                )
             else:
                 raise RuntimeError(
                     f"Unable to parse initialization program line {line_nb}: {line}"
                 )
+    return initialization_program
+
 
-    memory = run_program(initialization_program, decoder_version)
+def docking_data(
+    initialization_program_path: Path, decoder_version: str, symbolic: bool = False
+) -> None:
+    if symbolic and decoder_version != "v2":
+        raise ValueError(
+            f"Symbolic memory is only supported by the v2 decoder, not by the {decoder_version} decoder."
+        )
+    initialization_program = read_initialization_program(initialization_program_path)
+    if symbolic:
+        total, peak_patterns = sum_memory_v2(initialization_program)
+        print(f"At most {peak_patterns} address patterns were held in memory at once.")
+    else:
+        total = sum(run_program(initialization_program, decoder_version).values())
     print(
-        f"The sum of all values left in memory after the program completes is {sum(memory.values())}."
+        f"The sum of all values left in memory after the program completes is {total}."
     )
 
 
@@ -91,5 +203,12 @@ if __name__ == "__main__":
         choices=["v1", "v2"],
         help="The version of the decoder chip to emulate",
     )
+    parser.add_argument(
+        "--symbolic",
+        action="store_true",
+        help="Whether to track the floating addresses written by the v2 decoder as patterns, instead of expanding them",
+    )
     args = parser.parse_args()
-    docking_data(args.initialization_program_path, args.decoder_version)
+    docking_data(
+        args.initialization_program_path, args.decoder_version, symbolic=args.symbolic
+    )
@@ -1,21 +1,224 @@
+import mmap
+import os
+import struct
+import time
+from array import array
 from pathlib import Path
+from typing import Dict, Iterable, List, MutableSequence, Optional, Sequence, Tuple
 
+# Header of the checkpoint files: turn reached (0 while the checkpoint is being written), number spoken on that turn,
+# item size of the last-seen table and number of starting numbers. The starting numbers and the table follow it
+CHECKPOINT_HEADER = struct.Struct("<4Q")
 
-def rambunctious_recitation(starting_numbers_path: Path, num_turns: int) -> None:
+# Turn reached, number spoken on that turn, and table of the turn each number was last spoken
+GameState = Tuple[int, int, array]
+
+
+def make_last_seen_table(size: int, num_turns: int) -> array:
+    """Allocates a zeroed table of the turn each number was last spoken, with the smallest item type fitting the turns.
+
+    Turn 0 never happens, so a zero marks a number that has not been spoken yet.
+    """
+    typecode = "I" if num_turns < 1 << 32 else "Q"
+    return array(typecode, bytes(size * array(typecode).itemsize))
+
+
+def resize_last_seen_table(last_seen: array, size: int, num_turns: int) -> array:
+    """Grows a last-seen table, so that it can be used to keep playing up to `num_turns`."""
+    if last_seen.typecode == "I" and num_turns >= 1 << 32:
+        last_seen = array("Q", last_seen)
+    if len(last_seen) < size:
+        last_seen.frombytes(bytes((size - len(last_seen)) * last_seen.itemsize))
+    return last_seen
+
+
+def save_checkpoint(
+    checkpoint_path: Path, starting_numbers: Sequence[int], state: GameState
+) -> None:
+    """Writes the state of a game to a memory-mapped checkpoint file.
+
+    The checkpoint is written to a temporary file next to `checkpoint_path`, which only replaces the previous
+    checkpoint once it is fully synced to disk, so that an interrupted save never loses the last good checkpoint. The
+    turn in the header of the temporary file is zeroed until everything else is flushed, so that a torn temporary file
+    is never mistaken for a valid checkpoint.
+    """
+    turn, last_number, last_seen = state
+    table_offset = CHECKPOINT_HEADER.size + 8 * len(starting_numbers)
+    size = table_offset + len(last_seen) * last_seen.itemsize
+    tmp_checkpoint_path = checkpoint_path.with_name(checkpoint_path.name + ".tmp")
+    with open(tmp_checkpoint_path, "w+b") as file:
+        file.truncate(size)
+        with mmap.mmap(file.fileno(), size) as checkpoint:
+            header = (last_number, last_seen.itemsize, len(starting_numbers))
+            CHECKPOINT_HEADER.pack_into(checkpoint, 0, 0, *header)
+            struct.pack_into(
+                f"<{len(starting_numbers)}Q",
+                checkpoint,
+                CHECKPOINT_HEADER.size,
+                *starting_numbers,
+            )
+            checkpoint[table_offset:] = memoryview(last_seen).cast("B")
+            checkpoint.flush()
+            CHECKPOINT_HEADER.pack_into(checkpoint, 0, turn, *header)
+            checkpoint.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_checkpoint_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path: Path) -> Tuple[List[int], GameState]:
+    with open(checkpoint_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as checkpoint:
+        turn, last_number, itemsize, num_starting_numbers = (
+            CHECKPOINT_HEADER.unpack_from(checkpoint)
+        )
+        if not turn:
+            raise RuntimeError(
+                f"The checkpoint '{checkpoint_path}' is incomplete, since it was interrupted while being written."
+            )
+        starting_numbers = list(
+            struct.unpack_from(
+                f"<{num_starting_numbers}Q", checkpoint, CHECKPOINT_HEADER.size
+            )
+        )
+        last_seen = array("I" if itemsize == array("I").itemsize else "Q")
+        with memoryview(checkpoint) as view:
+            last_seen.frombytes(
+                view[CHECKPOINT_HEADER.size + 8 * num_starting_numbers :]
+            )
+    return starting_numbers, (turn, last_number, last_seen)
+
+
+def speak_numbers(
+    last_seen: MutableSequence[int], last_number: int, turn: int, num_turns: int
+) -> int:
+    """Plays the game from the `turn` where `last_number` was spoken, up to `num_turns`.
+
+    Returns:
+        Number spoken on turn `num_turns`.
+    """
+    for turn in range(turn, num_turns):
+        last_turn = last_seen[last_number]
+        last_seen[last_number] = turn
+        last_number = turn - last_turn if last_turn else 0
+    return last_number
+
+
+def play_game(
+    starting_numbers: Sequence[int],
+    num_turns: Iterable[int],
+    report_every: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: Optional[int] = None,
+) -> Dict[int, int]:
+    """Plays the memory game, with the turn each number was last spoken stored in a table indexed by number.
+
+    Every number spoken after the starting numbers is the gap between two turns, so is smaller than the number of
+    turns. The table can thus be preallocated once, rather than grown as a dict of boxed ints.
+
+    Args:
+        starting_numbers: Numbers spoken on the first turns.
+        num_turns: Turns (numbered from 1) for which to find the number spoken, all answered in a single game.
+        report_every: Number of turns between two progress reports. Defaults to no reporting.
+        checkpoint_path: Path of the checkpoint file to resume the game from, if it exists, and to save the game to.
+        checkpoint_every: Number of turns between two checkpoints. Defaults to only saving the game once it is over.
+
+    Returns:
+        Number spoken on each of the requested turns.
+    """
+    queries = sorted(set(num_turns))
+    if queries and queries[0] < 1:
+        raise ValueError(
+            f"Turns are numbered from 1, but the number spoken on turn {queries[0]} was requested."
+        )
+    numbers = {
+        turn: starting_numbers[turn - 1]
+        for turn in queries
+        if turn <= len(starting_numbers)
+    }
+    queries = queries[len(numbers) :]
+    if not queries:
+        return numbers
+    horizon = queries[-1]
+    table_size = max(horizon, max(starting_numbers) + 1)
+
+    if checkpoint_path is not None and checkpoint_path.exists():
+        checkpoint_starting_numbers, (turn, last_number, last_seen) = load_checkpoint(
+            checkpoint_path
+        )
+        if checkpoint_starting_numbers != list(starting_numbers):
+            raise RuntimeError(
+                f"The checkpoint '{checkpoint_path}' was saved from a game with different starting numbers: "
+                f"{checkpoint_starting_numbers}."
+            )
+        if queries[0] < turn:
+            raise RuntimeError(
+                f"The checkpoint '{checkpoint_path}' is already at turn {turn}, past the requested turn {queries[0]}."
+            )
+        last_seen = resize_last_seen_table(last_seen, table_size, horizon)
+    else:
+        last_seen = make_last_seen_table(table_size, horizon)
+        for turn, number in enumerate(starting_numbers[:-1], 1):
+            last_seen[number] = turn
+        last_number, turn = starting_numbers[-1], len(starting_numbers)
+
+    start, start_turn = time.perf_counter(), turn
+    queries_left = iter(queries)
+    next_query = next(queries_left)
+    while True:
+        if turn == next_query:
+            numbers[turn] = last_number
+            next_query = next(queries_left, None)
+        if turn == horizon:
+            break
+        # Stop at the next query, progress report or checkpoint, whichever comes first
+        next_turn = min(
+            [next_query]
+            + [
+                (turn // every + 1) * every
+                for every in (report_every, checkpoint_every)
+                if every
+            ]
+        )
+        last_number = speak_numbers(last_seen, last_number, turn, next_turn)
+        turn = next_turn
+
+        if report_every and (turn == horizon or not turn % report_every):
+            elapsed_time = time.perf_counter() - start
+            print(
+                f"Turn {turn}/{horizon} ({turn / horizon:.1%}), "
+                f"{(turn - start_turn) / elapsed_time:.0f} turns/s."
+            )
+        if checkpoint_path is not None and (
+            turn == horizon or checkpoint_every and not turn % checkpoint_every
+        ):
+            save_checkpoint(
+                checkpoint_path, starting_numbers, (turn, last_number, last_seen)
+            )
+    return numbers
+
+
+def rambunctious_recitation(
+    starting_numbers_path: Path,
+    num_turns: Sequence[int],
+    report_every: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: Optional[int] = None,
+) -> None:
 
     with open(starting_numbers_path) as file:
         starting_numbers = [int(number) for number in file.read().split(",")]
 
-    numbers = {number: turn for turn, number in enumerate(starting_numbers[:-1], 1)}
-    last_number, number = starting_numbers[-1], starting_numbers[-1]
-    for turn in range(len(starting_numbers) + 1, num_turns + 1):
-        number = turn - 1 - numbers.get(last_number, 0)
-        numbers[last_number] = turn - 1  # Mark turn of last number
-        if number == turn - 1:  # If the number had never been said before
-            number = 0
-        last_number = number
+    numbers = play_game(
+        starting_numbers,
+        num_turns,
+        report_every=report_every,
+        checkpoint_path=checkpoint_path,
+        checkpoint_every=checkpoint_every,
+    )
 
-    print(f"The {num_turns}th number spoken will be {number}.")
+    for turn, number in numbers.items():
+        print(f"The {turn}th number spoken will be {number}.")
 
 
 if __name__ == "__main__":
@@ -29,6 +232,34 @@ if __name__ == "__main__":
         type=Path,
         help="The path to the starting numbers data file to read",
     )
-    parser.add_argument("num_turns", type=int, help="Number of turns to play the game")
+    parser.add_argument(
+        "num_turns",
+        type=int,
+        nargs="+",
+        help="Turns for which to find the number spoken, all answered by playing the game once",
+    )
+    parser.add_argument(
+        "--report_every",
+        type=int,
+        help="Number of turns between two reports of the game's progress and throughput",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        type=Path,
+        help="The path of the checkpoint file to resume the game from (if it exists) and to save the game to",
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        type=int,
+        help="Number of turns between two checkpoints. Defaults to only saving the game once it is over",
+    )
     args = parser.parse_args()
-    rambunctious_recitation(args.starting_numbers_path, args.num_turns)
+    if any(turn < 1 for turn in args.num_turns):
+        parser.error("num_turns: turns are numbered from 1")
+    rambunctious_recitation(
+        args.starting_numbers_path,
+        args.num_turns,
+        report_every=args.report_every,
+        checkpoint_path=args.checkpoint_path,
+        checkpoint_every=args.checkpoint_every,
+    )
@@ -1,68 +1,110 @@
+import io
+import re
 from pathlib import Path
+from typing import List, Tuple
 
 import numpy as np
 from scipy.sparse import csr_matrix
 from scipy.sparse.csgraph import maximum_bipartite_matching
 
 
-def ticket_translation(ticket_notes_path: Path) -> None:
-
-    fields = {}
-    tickets = []
+def read_ticket_notes(
+    ticket_notes_path: Path,
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Reads the notes about the tickets, with the tickets parsed in bulk into a single integer matrix.
 
+    Returns:
+        Names of the fields, (num_fields, num_ranges, 2) array of the inclusive bounds of the valid ranges of each field,
+        and (num_tickets, num_fields) matrix of the values on the tickets, starting with your ticket.
+    """
     with open(ticket_notes_path) as file:
-        notes_block = 0
-        lines = file.read().splitlines()
-        line_idx = 0
-        while line_idx < len(lines):
-            if not (line := lines[line_idx]):
-                notes_block += 1  # Change the algorithm for interpreting the input
-                line_idx += 2  # Skip the first line (the header) of the new block
-                continue
-
-            if notes_block == 0:
-                field_name, conditions = line.split(":")
-                range1, range2 = list(
-                    map(
-                        lambda x: range(int(x.split("-")[0]), int(x.split("-")[1]) + 1),
-                        conditions.replace(" ", "").split("or"),
-                    )
-                )
-                fields[field_name] = range1, range2
-            else:
-                tickets.append(list(map(int, line.split(","))))
-
-            line_idx += 1
+        rules_block, your_ticket_block, nearby_tickets_block = (
+            file.read().strip().split("\n\n")
+        )
 
-    # Part one
-    invalid_values = [
-        (ticket_id, val)
-        for ticket_id, vals in enumerate(tickets)
-        for val in vals
-        if not any(val in range1 or val in range2 for range1, range2 in fields.values())
-    ]
+    field_names, field_ranges = [], []
+    for line in rules_block.splitlines():
+        field_name, conditions = line.split(":")
+        field_names.append(field_name)
+        field_ranges.append([int(bound) for bound in re.findall(r"\d+", conditions)])
+    # Pad the fields with fewer ranges with empty ranges, so that all fields fit in the same array
+    num_bounds = max(map(len, field_ranges))
+    field_ranges = np.array(
+        [ranges + [1, 0] * ((num_bounds - len(ranges)) // 2) for ranges in field_ranges]
+    ).reshape(len(field_names), -1, 2)
 
-    print(
-        f"The ticket scanning error rate is {sum(invalid_val for _, invalid_val in invalid_values)}."
+    tickets = np.loadtxt(
+        io.StringIO(your_ticket_block + "\n" + nearby_tickets_block),
+        delimiter=",",
+        dtype=np.int64,
+        comments=("your", "nearby"),
+        ndmin=2,
     )
+    return field_names, field_ranges, tickets
 
-    # Part two
-    invalid_tickets = sorted(set(ticket_id for ticket_id, _ in invalid_values))
-    tickets = np.array(
-        [ticket for id, ticket in enumerate(tickets) if id not in invalid_tickets]
-    )
 
-    field_validity_matrix = [
-        [
-            all(val in range1 or val in range2 for val in tickets[:, field_rank])
-            for field_name, (range1, range2) in fields.items()
-        ]
-        for field_rank in range(len(fields))
-    ]
+def build_interval_index(field_ranges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Splits the number line into the elementary segments delimited by the fields' ranges.
+
+    Args:
+        field_ranges: (num_fields, num_ranges, 2) array of the inclusive bounds of the valid ranges of each field.
+
+    Returns:
+        Sorted boundaries of the segments, where segment `k` spans `[boundaries[k - 1], boundaries[k])`, and
+        (num_segments, ceil(num_fields / 8)) bit-packed matrix of the fields for which each segment is valid.
+    """
+    num_fields = len(field_ranges)
+    starts, ends = field_ranges[..., 0], field_ranges[..., 1] + 1
+    boundaries = np.unique(np.concatenate([starts.ravel(), ends.ravel()]))
+
+    # Mark the first and past-the-end segments of each range, then sum them to find the segments covered by each field
+    covered = np.zeros((len(boundaries) + 2, num_fields), dtype=np.int64)
+    fields = np.broadcast_to(np.arange(num_fields)[:, None], starts.shape)
+    np.add.at(covered, (np.searchsorted(boundaries, starts, side="right"), fields), 1)
+    np.add.at(covered, (np.searchsorted(boundaries, ends, side="right"), fields), -1)
+    field_validity = np.cumsum(covered, axis=0)[:-1] > 0
+    return boundaries, np.packbits(field_validity, axis=1)
+
+
+def validate_tickets(
+    tickets: np.ndarray, field_ranges: np.ndarray
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Validates all the values of all the tickets against all the fields at once, using a merged interval index.
+
+    Args:
+        tickets: (num_tickets, num_columns) matrix of the values on the tickets.
+        field_ranges: (num_fields, num_ranges, 2) array of the inclusive bounds of the valid ranges of each field.
+
+    Returns:
+        Ticket scanning error rate, boolean mask of the valid tickets, and (num_columns, num_fields) boolean matrix of
+        whether the values in each column of the valid tickets are all valid for each field.
+    """
+    boundaries, segments_fields = build_interval_index(field_ranges)
+    values_fields = segments_fields[np.searchsorted(boundaries, tickets, side="right")]
+
+    invalid_values = ~values_fields.any(axis=-1)
+    error_rate = int(tickets[invalid_values].sum())
+    valid_tickets = ~invalid_values.any(axis=1)
+
+    columns_fields = np.bitwise_and.reduce(values_fields[valid_tickets], axis=0)
+    field_validity_matrix = np.unpackbits(
+        columns_fields, axis=-1, count=len(field_ranges)
+    ).astype(bool)
+    return error_rate, valid_tickets, field_validity_matrix
+
+
+def ticket_translation(ticket_notes_path: Path) -> None:
+    field_names, field_ranges, tickets = read_ticket_notes(ticket_notes_path)
+    error_rate, _, field_validity_matrix = validate_tickets(tickets, field_ranges)
+
+    # Part one
+    print(f"The ticket scanning error rate is {error_rate}.")
+
+    # Part two
     bipartite_matching = maximum_bipartite_matching(csr_matrix(field_validity_matrix))
     field_ranks = {
         field_name: bipartite_matching[idx]
-        for idx, field_name in enumerate(fields.keys())
+        for idx, field_name in enumerate(field_names)
     }
 
     product = np.prod(
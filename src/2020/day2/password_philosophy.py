@@ -1,5 +1,23 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterable, Iterator, Literal, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from utils.files import Chunk, read_chunk_lines, split_in_chunks
+
+
+class PasswordsBatch(NamedTuple):
+    """Columnar representation of a list of passwords and their policies."""
+
+    first: np.ndarray  # (N,) first number of the policies
+    second: np.ndarray  # (N,) second number of the policies
+    letter: np.ndarray  # (N,) byte code of the letters of the policies
+    password: np.ndarray  # (N, max_len) password bytes, padded with zeros
+    length: np.ndarray  # (N,) length of the passwords
 
 
 def is_password_sled_valid(first: int, second: int, letter: str, password: str) -> bool:
@@ -12,22 +30,183 @@ def is_password_tobogan_valid(
     return (password[first - 1] == letter) ^ (password[second - 1] == letter)
 
 
-def validate_passwords(
-    passwords_path: Path, is_password_valid_fn: Callable[[int, int, str, str], bool]
-) -> None:
-    with open(passwords_path) as file:
-        passwords_w_policy = file.read().splitlines()
-    valid_passwords = []
+def are_passwords_sled_valid(passwords: PasswordsBatch) -> np.ndarray:
+    letter_count = (passwords.password == passwords.letter[:, None]).sum(axis=1)
+    return (passwords.first <= letter_count) & (letter_count <= passwords.second)
+
+
+def are_passwords_tobogan_valid(passwords: PasswordsBatch) -> np.ndarray:
+    def is_letter_at(position: np.ndarray) -> np.ndarray:
+        idx = np.clip(position - 1, 0, passwords.password.shape[1] - 1)
+        letter_at = np.take_along_axis(passwords.password, idx[:, None], axis=1)[:, 0]
+        return (
+            (letter_at == passwords.letter)
+            & (1 <= position)
+            & (position <= passwords.length)
+        )
+
+    return is_letter_at(passwords.first) ^ is_letter_at(passwords.second)
+
+
+def _gather_padded(
+    data: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> np.ndarray:
+    """Gathers the `data[start:end]` slices into a zero-padded matrix, without looping over the slices in Python."""
+    lengths = ends - starts
+    max_len = lengths.max(initial=0)
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.concatenate((data, np.zeros(max_len, dtype=data.dtype))), max_len
+    )
+    slices = windows[starts]  # Only copies the N x max_len rows that are selected
+    slices[np.arange(max_len) >= lengths[:, None]] = 0
+    return slices
+
+
+def _parse_uints(data: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Parses the base-10 unsigned integers written in the `data[start:end]` slices, digit column by digit column."""
+    digits = _gather_padded(data, starts, ends).astype(np.int64)
+    vals = np.zeros(len(starts), dtype=np.int64)
+    for col in range(digits.shape[1]):
+        is_digit = col < ends - starts
+        vals = np.where(is_digit, vals * 10 + digits[:, col] - ord("0"), vals)
+    return vals
+
+
+def parse_passwords(passwords_path: Path) -> PasswordsBatch:
+    with open(passwords_path, "rb") as file:
+        data = np.frombuffer(file.read() + b"\n", dtype=np.uint8)
+
+    # Delimit the non-empty lines, ignoring any carriage return before the newlines
+    line_ends = np.flatnonzero(data == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_ends -= (line_ends > line_starts) & (data[line_ends - 1] == ord("\r"))
+    non_empty = line_ends > line_starts
+    line_starts, line_ends = line_starts[non_empty], line_ends[non_empty]
+
+    # Locate the separators of each line's "first-second letter: password" format
+    dashes = np.flatnonzero(data == ord("-"))
+    dashes = dashes[np.searchsorted(dashes, line_starts)]
+    colons = np.flatnonzero(data == ord(":"))
+    colons = colons[np.searchsorted(colons, line_starts)]
+
+    password_starts = colons + 2
+    return PasswordsBatch(
+        first=_parse_uints(data, line_starts, dashes),
+        second=_parse_uints(data, dashes + 1, colons - 2),
+        letter=data[colons - 1],
+        password=_gather_padded(data, password_starts, line_ends),
+        length=line_ends - password_starts,
+    )
+
+
+def filter_valid_passwords(
+    passwords_w_policy: Iterable[str],
+    is_password_valid_fn: Callable[[int, int, str, str], bool],
+) -> Iterator[str]:
     for password_w_policy in passwords_w_policy:
         first, second, letter, password = (
             password_w_policy.replace("-", " ").replace(":", " ").split()
         )
         if is_password_valid_fn(int(first), int(second), letter, password):
-            valid_passwords.append(password_w_policy)
+            yield password_w_policy
+
+
+def validate_passwords(
+    passwords_path: Path, is_password_valid_fn: Callable[[int, int, str, str], bool]
+) -> None:
+    with open(passwords_path) as file:
+        passwords_w_policy = file.read().splitlines()
+    valid_passwords = list(
+        filter_valid_passwords(passwords_w_policy, is_password_valid_fn)
+    )
     print(f"{len(valid_passwords)} valid passwords were found: ")
     print("\n".join(valid_passwords))
 
 
+def _validate_chunk(
+    passwords_path: Path,
+    chunk: Chunk,
+    is_password_valid_fn: Callable[[int, int, str, str], bool],
+    keep_valid: bool,
+) -> Tuple[int, str]:
+    passwords_w_policy = read_chunk_lines(passwords_path, chunk)
+    valid_passwords = filter_valid_passwords(
+        (line for line in passwords_w_policy if line), is_password_valid_fn
+    )
+    if keep_valid:
+        valid_passwords = list(valid_passwords)
+        return len(valid_passwords), "".join(f"{line}\n" for line in valid_passwords)
+    return sum(1 for _ in valid_passwords), ""
+
+
+def stream_validate_passwords(
+    passwords_path: Path,
+    is_password_valid_fn: Callable[[int, int, str, str], bool],
+    num_workers: Optional[int] = None,
+    chunk_size: int = 1 << 24,
+    output_path: Optional[Path] = None,
+    list_valid: bool = True,
+) -> int:
+    """Validates the passwords in a file chunk by chunk, with the chunks dispatched to a pool of worker processes.
+
+    Only a bounded number of chunks are in flight at any time, and the results of the chunks are merged in the order
+    of the file as soon as they are available, so that memory usage does not depend on the size of the file.
+
+    Args:
+        passwords_path: The path to the passwords file to read.
+        is_password_valid_fn: The policy to use to determine if a password is valid.
+        num_workers: Number of worker processes. Defaults to the number of CPUs.
+        chunk_size: Approximate size, in bytes, of the chunks of the file handled by each task.
+        output_path: The path of the file where to write the valid passwords. Defaults to the standard output.
+        list_valid: Whether to write the valid passwords, or only count them.
+
+    Returns:
+        Number of valid passwords found in the file.
+    """
+    num_workers = num_workers or os.cpu_count()
+    chunks = iter(split_in_chunks(passwords_path, chunk_size))
+    num_valid_passwords = 0
+    output = open(output_path, "w") if output_path else sys.stdout
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            pending = deque()
+            while True:
+                # Keep every worker busy, with some results buffered, but never read ahead the whole file
+                while len(pending) < 2 * num_workers and (chunk := next(chunks, None)):
+                    pending.append(
+                        executor.submit(
+                            _validate_chunk,
+                            passwords_path,
+                            chunk,
+                            is_password_valid_fn,
+                            list_valid,
+                        )
+                    )
+                if not pending:
+                    break
+                chunk_num_valid_passwords, chunk_valid_passwords = (
+                    pending.popleft().result()
+                )
+                num_valid_passwords += chunk_num_valid_passwords
+                output.write(chunk_valid_passwords)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{num_valid_passwords} valid passwords were found.")
+    return num_valid_passwords
+
+
+def count_valid_passwords(
+    passwords_path: Path, password_policy: Literal["sled", "tobogan"]
+) -> int:
+    passwords = parse_passwords(passwords_path)
+    are_passwords_valid_fn = globals()[f"are_passwords_{password_policy}_valid"]
+    num_valid_passwords = int(are_passwords_valid_fn(passwords).sum())
+    print(f"{num_valid_passwords} valid passwords were found.")
+    return num_valid_passwords
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -43,7 +222,49 @@ if __name__ == "__main__":
         choices=["sled", "tobogan"],
         help="The policy to use to determine if the password is valid",
     )
-    args = parser.parse_args()
-    validate_passwords(
-        args.passwords_path, locals()[f"is_password_{args.password_policy}_valid"]
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["python", "numpy", "stream"],
+        default="python",
+        help="Whether to validate passwords one by one and list the valid ones, "
+        "to only count them using vectorized operations over the whole file, "
+        "or to validate chunks of the file in parallel worker processes",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        help="For the 'stream' engine, the number of worker processes. Defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=1 << 24,
+        help="For the 'stream' engine, the approximate size (in bytes) of the chunks of the file to validate",
+    )
+    parser.add_argument(
+        "--output_path",
+        type=Path,
+        help="For the 'stream' engine, the path of the file where to write the valid passwords. "
+        "Defaults to the standard output",
     )
+    parser.add_argument(
+        "--count_only",
+        action="store_true",
+        help="For the 'stream' engine, whether to only count the valid passwords without writing them",
+    )
+    args = parser.parse_args()
+    is_password_valid_fn = locals()[f"is_password_{args.password_policy}_valid"]
+    if args.engine == "python":
+        validate_passwords(args.passwords_path, is_password_valid_fn)
+    elif args.engine == "numpy":
+        count_valid_passwords(args.passwords_path, args.password_policy)
+    else:  # args.engine == "stream"
+        stream_validate_passwords(
+            args.passwords_path,
+            is_password_valid_fn,
+            num_workers=args.num_workers,
+            chunk_size=args.chunk_size,
+            output_path=args.output_path,
+            list_valid=not args.count_only,
+        )
@@ -1,40 +1,59 @@
 from functools import reduce
 from operator import mul
 from pathlib import Path
+from typing import List, Tuple
 
+import numpy as np
 
-def tobogan_trajectory(map_path: Path, slopes_path: Path) -> None:
+
+def count_trees_hit(area_map: np.ndarray, slopes: np.ndarray) -> np.ndarray:
+    """Counts the trees hit following each slope, gathering the positions visited along all slopes at once.
+
+    Args:
+        area_map: (H, W) boolean map, where trees are `True`. The map repeats itself indefinitely to the right.
+        slopes: (N, 2) slopes, as (right, down) steps.
+
+    Returns:
+        (N,) number of trees hit while following each slope.
+    """
+    nb_rows, nb_cols = area_map.shape
+    horizontal_slopes, vertical_slopes = slopes[:, 0] % nb_cols, slopes[:, 1]
+
+    # Flatten the steps taken along every slope, keeping track of the slope each step belongs to
+    nb_steps = -(-nb_rows // vertical_slopes)
+    slope_idx = np.repeat(np.arange(len(slopes)), nb_steps)
+    step = np.arange(nb_steps.sum()) - np.repeat(
+        np.cumsum(nb_steps) - nb_steps, nb_steps
+    )
+
+    trees_hit = area_map[
+        step * vertical_slopes[slope_idx],
+        (step * horizontal_slopes[slope_idx]) % nb_cols,
+    ]
+    return np.bincount(slope_idx, weights=trees_hit, minlength=len(slopes)).astype(int)
+
+
+def tobogan_trajectory(map_path: Path, slopes_path: Path) -> Tuple[List[int], int]:
     with open(map_path) as file:
-        area_map = file.read().splitlines()
-
-    with open(slopes_path) as file:
-        slopes = [tuple(map(int, line.split())) for line in file.read().splitlines()]
-
-    horizontal_pattern_len = len(area_map[0])
-    nb_trees_hit_wrt_slope = []
-    for slope in slopes:
-        horizontal_slope, vertical_slope = slope
-        horizontal_pos, vertical_pos = 0, 0
-        nb_trees_hit = 0
-        while vertical_pos < len(area_map):
-            # Detect if we hit a treefollowing
-            nb_trees_hit += (
-                area_map[vertical_pos][horizontal_pos % horizontal_pattern_len] == "#"
-            )
-
-            # Move following the slope
-            vertical_pos += vertical_slope
-            horizontal_pos += horizontal_slope
-
-        nb_trees_hit_wrt_slope.append(nb_trees_hit)
+        map_lines = file.read().split()
+    area_map = np.frombuffer("".join(map_lines).encode(), dtype=np.uint8).reshape(
+        len(map_lines), -1
+    ) == ord("#")
+
+    slopes = np.loadtxt(slopes_path, dtype=int, ndmin=2)
+
+    nb_trees_hit_wrt_slope = count_trees_hit(area_map, slopes).tolist()
+    for (horizontal_slope, vertical_slope), nb_trees_hit in zip(
+        slopes, nb_trees_hit_wrt_slope
+    ):
         print(
             f"We hit {nb_trees_hit} trees while following a slope of "
             f"right {horizontal_slope} and down {vertical_slope}."
         )
 
-    print(
-        f"Product of the number of trees hit w.r.t. each slope: {reduce(mul, nb_trees_hit_wrt_slope)}"
-    )
+    product = reduce(mul, nb_trees_hit_wrt_slope)
+    print(f"Product of the number of trees hit w.r.t. each slope: {product}")
+    return nb_trees_hit_wrt_slope, product
 
 
 if __name__ == "__main__":
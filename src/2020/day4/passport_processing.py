@@ -1,89 +1,123 @@
 import re
-import string
-import sys
+import typing
+from collections import Counter
 from pathlib import Path
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Iterable, Literal, Mapping, NamedTuple
+
+from utils.records import RecordsCounter, read_records
+
+# Validators of the required fields, built once so that validating a field is a single precompiled match or lookup
+FIELD_VALIDATORS: Mapping[str, Callable[[str], Any]] = {
+    "byr": re.compile(r"19[2-9][0-9]|200[0-2]").fullmatch,
+    "iyr": re.compile(r"201[0-9]|2020").fullmatch,
+    "eyr": re.compile(r"202[0-9]|2030").fullmatch,
+    "hgt": re.compile(r"1(?:[5-8][0-9]|9[0-3])cm|(?:59|6[0-9]|7[0-6])in").fullmatch,
+    "hcl": re.compile(r"#[0-9a-fA-F]*").fullmatch,
+    "ecl": frozenset({"amb", "blu", "brn", "gry", "grn", "hzl", "oth"}).__contains__,
+    "pid": re.compile(r"[0-9]{9}").fullmatch,
+}
+REQUIRED_FIELDS = frozenset(FIELD_VALIDATORS)
+
+
+class PassportsReport(NamedTuple):
+    num_passports: int
+    # Number of passports with all the required fields
+    num_complete: int
+    # Number of passports with all the required fields, and all of them valid
+    num_valid: int
+    # Number of passports missing each field
+    missing_fields: typing.Counter[str]
+    # Number of passports with an invalid value for each field
+    invalid_fields: typing.Counter[str]
 
 
 def has_passport_required_fields(passport: Dict[str, Any]) -> bool:
-    passport_copy = passport.copy()
-    passport_copy.pop("cid", None)
-    return len(passport_copy) == 7
+    return REQUIRED_FIELDS.issubset(passport)
 
 
 def is_byr_valid(val: str) -> bool:
-    return 1920 <= int(val) <= 2002
+    return bool(FIELD_VALIDATORS["byr"](val))
 
 
 def is_iyr_valid(val: str) -> bool:
-    return 2010 <= int(val) <= 2020
+    return bool(FIELD_VALIDATORS["iyr"](val))
 
 
 def is_eyr_valid(val: str) -> bool:
-    return 2020 <= int(val) <= 2030
+    return bool(FIELD_VALIDATORS["eyr"](val))
 
 
 def is_hgt_valid(val: str) -> bool:
-    try:
-        height_val, height_unit = int(val[:-2]), val[-2:]
-    except ValueError:
-        return False
-    return (
-        150 <= height_val <= 193
-        if height_unit == "cm"
-        else 59 <= height_val <= 76
-        if height_unit == "in"
-        else False
-    )
+    return bool(FIELD_VALIDATORS["hgt"](val))
 
 
 def is_hcl_valid(val: str) -> bool:
-    return val[0] == "#" and all(c in string.hexdigits for c in val[1:])
+    return bool(FIELD_VALIDATORS["hcl"](val))
 
 
 def is_ecl_valid(val: str) -> bool:
-    return val in ["amb", "blu", "brn", "gry", "grn", "hzl", "oth"]
+    return bool(FIELD_VALIDATORS["ecl"](val))
 
 
 def is_pid_valid(val: str) -> bool:
-    return bool(re.compile("^[0-9]{9}$").match(val))
+    return bool(FIELD_VALIDATORS["pid"](val))
 
 
 def is_passport_valid(passport: Dict[str, Any]) -> bool:
-    if has_passport_required_fields(passport):
-        are_fields_valid = all(
-            getattr(sys.modules[__name__], f"is_{field}_valid")(val)
-            for field, val in passport.items()
-            if field != "cid"
-        )
-        return are_fields_valid
-    return False
-
+    return has_passport_required_fields(passport) and all(
+        validator(passport[field]) for field, validator in FIELD_VALIDATORS.items()
+    )
 
-def passport_processing(
-    passports_path: Path, is_passport_valid_fn: Callable[[Dict[str, Any]], bool]
-) -> None:
-    with open(passports_path) as file:
-        passports_lines = file.read().splitlines()
 
-    # Group data by passport
-    passports = [{}]
-    for line in passports_lines:
-        if not line:  # Create a new entry for a passport on a blank line
-            passports.append({})
-            continue
+def validate_many(passports: Iterable[Dict[str, Any]]) -> PassportsReport:
+    """Validates a batch of passports, checking every required field to report which ones cause passports to fail."""
+    num_passports = num_complete = num_valid = 0
+    missing_fields, invalid_fields = Counter(), Counter()
+    validators = FIELD_VALIDATORS.items()
+    for passport in passports:
+        num_passports += 1
+        is_complete = is_valid = True
+        for field, validator in validators:
+            if (val := passport.get(field)) is None:
+                missing_fields[field] += 1
+                is_complete = is_valid = False
+            elif not validator(val):
+                invalid_fields[field] += 1
+                is_valid = False
+        num_complete += is_complete
+        num_valid += is_valid
+    return PassportsReport(
+        num_passports, num_complete, num_valid, missing_fields, invalid_fields
+    )
 
-        passport = passports[-1]
 
-        # Build dict of the current line's data, and add it to the current passport
-        passport_data_list = re.split("[: ]", line)
-        data_keys = passport_data_list[0::2]
-        data_values = passport_data_list[1::2]
-        passport.update(dict(zip(data_keys, data_values)))
+def passport_processing(
+    passports_path: Path, validation: Literal["present", "valid"]
+) -> PassportsReport:
+    counter = RecordsCounter()
+    with open(passports_path) as file:
+        # Build a dict of each passport's data, from the "key:value" pairs across its lines
+        passports = (
+            dict(key_value.split(":", 1) for key_value in " ".join(record).split())
+            for record in read_records(file, counter=counter)
+        )
+        report = validate_many(passports)
 
-    num_valid_passports = sum(is_passport_valid_fn(passport) for passport in passports)
+    if validation == "present":
+        num_valid_passports = report.num_complete
+        failures = report.missing_fields
+    else:  # validation == "valid"
+        num_valid_passports = report.num_valid
+        failures = report.missing_fields + report.invalid_fields
 
     print(f"The batch contains {num_valid_passports} valid passports.")
+    for field, num_failures in failures.most_common():
+        print(f"{num_failures} passports failed validation on the '{field}' field.")
+    print(
+        f"Processed {counter.num_records} passports "
+        f"({counter.records_per_second:.0f} passports/s)."
+    )
+    return report
 
 
 if __name__ == "__main__":
@@ -97,8 +131,4 @@ if __name__ == "__main__":
     )
     parser.add_argument("validation", type=str, choices=["present", "valid"])
     args = parser.parse_args()
-    if args.validation == "present":
-        is_passport_valid_fn = has_passport_required_fields
-    else:  # args.validation == "valid"
-        is_passport_valid_fn = is_passport_valid
-    passport_processing(args.passports_path, is_passport_valid_fn)
+    passport_processing(args.passports_path, args.validation)
@@ -1,50 +1,55 @@
 from pathlib import Path
-from typing import Literal, Sequence, Tuple
 
+import numpy as np
 
-def binary_search(
-    bounds: Tuple[int, int], actions: Sequence[Literal["lower", "upper"]]
-) -> int:
-    min_bound, max_bound = bounds
-    diff = max_bound - min_bound
-
-    # Stop condition when we reach the last step of the binary search
-    if len(actions) == 1:
-        return min_bound if actions[0] == "lower" else max_bound
-    else:  # Recursively continue the binary search
-        mid = min_bound + (diff // 2)
-        if actions[0] == "lower":
-            next_bounds = min_bound, mid
-        else:
-            next_bounds = mid + 1, max_bound
-        return binary_search(next_bounds, actions[1:])
+# Each half picked during the search is a bit of the seat ID: the upper halves ("B" and "R") are 1s
+SEAT_BITS = str.maketrans("FBLR", "0101")
 
 
 def get_seat_id(boarding_pass: str) -> int:
-    row_search = {"F": "lower", "B": "upper"}
-    row = binary_search((0, 127), [row_search[half] for half in boarding_pass[:7]])
-    column_search = {"L": "lower", "R": "upper"}
-    column = binary_search((0, 7), [column_search[half] for half in boarding_pass[-3:]])
-    return row * 8 + column
+    # With `c` column characters, the ID `row * 2**c + column` is the binary number spelled out by the whole pass,
+    # whatever the number of characters used to encode the row and the column
+    return int(boarding_pass.translate(SEAT_BITS), 2)
 
 
-def binary_boarding(boarding_passes_path: Path) -> None:
+def get_seat_ids(boarding_passes_path: Path) -> np.ndarray:
     with open(boarding_passes_path) as file:
-        boarding_passes = file.read().splitlines()
+        boarding_passes = file.read().split()
+
+    pass_len = len(boarding_passes[0])
+    if pass_len > 62:
+        raise ValueError(
+            f"Boarding passes of {pass_len} characters encode seat IDs too large for 64-bit integers."
+        )
+    halves = np.frombuffer("".join(boarding_passes).encode(), dtype=np.uint8).reshape(
+        len(boarding_passes), pass_len
+    )
+    bits = (halves == ord("B")) | (halves == ord("R"))
+    return bits.astype(np.int64) @ (1 << np.arange(pass_len - 1, -1, -1))
 
-    seat_ids = [get_seat_id(boarding_pass) for boarding_pass in boarding_passes]
+
+def find_missing_seats(seat_ids: np.ndarray) -> np.ndarray:
+    """Lists the seat IDs missing between the lowest and highest seat IDs, using a bitmap of the occupied seats."""
+    min_seat_id = seat_ids.min()
+    occupied = np.zeros(seat_ids.max() - min_seat_id + 1, dtype=bool)
+    occupied[seat_ids - min_seat_id] = True
+    return np.flatnonzero(~occupied) + min_seat_id
+
+
+def binary_boarding(boarding_passes_path: Path) -> None:
+    seat_ids = get_seat_ids(boarding_passes_path)
 
     # Part One
-    print(f"The highest seat ID on a boarding pass is {max(seat_ids)}.")
+    print(f"The highest seat ID on a boarding pass is {seat_ids.max()}.")
 
     # Part Two
-    missing_seat_id = [
-        seat_id
-        for seat_id in range(min(seat_ids), max(seat_ids))
-        if seat_id not in seat_ids
-    ]
-    assert len(missing_seat_id) == 1
-    print(f"Our seat ID (the empty seat) is: {missing_seat_id[0]}.")
+    missing_seat_ids = find_missing_seats(seat_ids)
+    if len(missing_seat_ids) == 1:
+        print(f"Our seat ID (the empty seat) is: {missing_seat_ids[0]}.")
+    else:
+        print(
+            f"There are {len(missing_seat_ids)} empty seats: {missing_seat_ids.tolist()}."
+        )
 
 
 if __name__ == "__main__":
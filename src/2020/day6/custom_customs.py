@@ -1,35 +1,106 @@
-import string
+from functools import reduce
+from operator import and_, or_
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Sequence, Tuple
+
+import numpy as np
+
+from utils.records import RecordsCounter, read_records
+
+
+class Alphabet(dict):
+    """Maps each possible answer to its own bit, assigning bits to answers in the order they are first seen."""
+
+    def __missing__(self, answer: str) -> int:
+        bit = self[answer] = 1 << len(self)
+        return bit
+
+
+def get_answers_mask(answers: str, alphabet: Alphabet) -> int:
+    return reduce(or_, map(alphabet.__getitem__, answers), 0)
+
+
+def reduce_group_answers(
+    group_answers_lines: Sequence[str],
+    alphabet: Alphabet,
+    answer_condition: Literal["anyone", "everyone"],
+) -> int:
+    answers_masks = (get_answers_mask(line, alphabet) for line in group_answers_lines)
+    return reduce(or_ if answer_condition == "anyone" else and_, answers_masks)
+
+
+def count_answers_numpy(groups_answers_path: Path) -> Tuple[int, int]:
+    """Counts the questions to which anyone and everyone answered 'yes' in each group, summed over all groups.
+
+    Both counts are computed in a single pass of array operations over the bytes of the file: each line is reduced to
+    a 64-bit mask of its answers, and the masks of the lines in each group are then reduced with OR and AND.
+    """
+    with open(groups_answers_path, "rb") as file:
+        data = np.frombuffer(file.read() + b"\n", dtype=np.uint8)
+    data = data[data != ord("\r")]
+
+    # Assign each answer to its line, and each line to its group (delimited by blank lines)
+    is_newline = data == ord("\n")
+    answers_line = np.cumsum(is_newline)[~is_newline]
+    line_len = np.bincount(answers_line, minlength=is_newline.sum())
+    lines_group = np.cumsum(line_len == 0)[line_len > 0]
+    if not len(lines_group):
+        return 0, 0
+
+    alphabet, answers_code = np.unique(data[~is_newline], return_inverse=True)
+    if len(alphabet) > 64:
+        raise ValueError(
+            f"The answers use {len(alphabet)} different symbols, but at most 64 are supported by the NumPy engine."
+        )
+    answers_masks = np.left_shift(np.uint64(1), answers_code.astype(np.uint64))
+
+    # Reduce the answers' masks by line, then the lines' masks by group
+    line_starts = (np.cumsum(line_len) - line_len)[line_len > 0]
+    lines_masks = np.bitwise_or.reduceat(answers_masks, line_starts)
+    group_starts = np.flatnonzero(np.diff(lines_group, prepend=-1))
+    groups_masks = np.stack(
+        (
+            np.bitwise_or.reduceat(lines_masks, group_starts),
+            np.bitwise_and.reduceat(lines_masks, group_starts),
+        )
+    )
+
+    if hasattr(np, "bitwise_count"):  # Only available starting from NumPy 2.0
+        groups_counts = np.bitwise_count(groups_masks)
+    else:
+        groups_counts = np.unpackbits(groups_masks.view(np.uint8), axis=-1)
+    anyone_count, everyone_count = groups_counts.reshape(2, -1).sum(axis=1).tolist()
+    return anyone_count, everyone_count
 
 
 def custom_customs(
-    groups_answers_path: Path, answer_condition: Literal["anyone", "everyone"]
+    groups_answers_path: Path,
+    answer_condition: Literal["anyone", "everyone"],
+    engine: Literal["python", "numpy"],
 ) -> None:
-    with open(groups_answers_path) as file:
-        groups_answers_lines = file.read().splitlines()
-
-    if answer_condition == "anyone":
-        group_answer_update_fn = "union"
-        init_group_answers = set
-    else:  # answer_condition == "everyone"
-        group_answer_update_fn = "intersection"
-        init_group_answers = lambda: set(string.ascii_lowercase[:26])
-
-    # Group answers by groups
-    groups_answers = [init_group_answers()]
-    for line in groups_answers_lines:
-        if not line:  # Create a set of answers for a group on a blank line
-            groups_answers.append(init_group_answers())
-            continue
-
-        group_answers = groups_answers[-1]
-        # group_answers.update(line)
-        groups_answers[-1] = getattr(group_answers, group_answer_update_fn)(line)
+    if engine == "python":
+        # Reduce the answers of each group as its lines are read
+        counter = RecordsCounter()
+        alphabet = Alphabet()
+        num_answers = 0
+        with open(groups_answers_path) as file:
+            for group_answers_lines in read_records(file, counter=counter):
+                group_answers = reduce_group_answers(
+                    group_answers_lines, alphabet, answer_condition
+                )
+                num_answers += group_answers.bit_count()
+    else:  # engine == "numpy"
+        counter = None
+        anyone_count, everyone_count = count_answers_numpy(groups_answers_path)
+        num_answers = anyone_count if answer_condition == "anyone" else everyone_count
 
     print(
-        f"Over all groups, {answer_condition} answered 'yes' to {sum(len(group_answers) for group_answers in groups_answers)} questions."
+        f"Over all groups, {answer_condition} answered 'yes' to {num_answers} questions."
     )
+    if counter is not None:
+        print(
+            f"Processed {counter.num_records} groups ({counter.records_per_second:.0f} groups/s)."
+        )
 
 
 if __name__ == "__main__":
@@ -47,5 +118,13 @@ if __name__ == "__main__":
         choices=["anyone", "everyone"],
         help="The condition to count 'yes' answers from a group",
     )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["python", "numpy"],
+        default="python",
+        help="Whether to stream the groups' answers as integer bitmasks, "
+        "or to count them with vectorized operations over the whole file",
+    )
     args = parser.parse_args()
-    custom_customs(args.groups_answers_path, args.answer_condition)
+    custom_customs(args.groups_answers_path, args.answer_condition, args.engine)
@@ -1,52 +1,159 @@
+from collections import defaultdict, deque
 from pathlib import Path
-from typing import Set
-
-import pandas as pd
-
-
-def can_be_contained_by(bags_rules: pd.DataFrame, color: str) -> Set[str]:
-    parents = bags_rules[bags_rules.child == color].parent.to_list()
-    for parent in parents:
-        parents.extend(can_be_contained_by(bags_rules, parent))
-    return set(parents)
-
-
-def number_of_child_bags(bags_rules: pd.DataFrame, color: str) -> int:
-    childs = bags_rules[bags_rules.parent == color]
-    num_childs = 0
-    for child, child_count in zip(childs.child, childs.num):
-        num_childs += child_count * (1 + number_of_child_bags(bags_rules, child))
-    return num_childs
-
-
-def bags_rules(bags_rules_path: Path) -> None:
-    with open(bags_rules_path) as file:
-        bags_rules_text = file.read().splitlines()
-
-    # Build relational table from rules
-    bags_rules = pd.DataFrame(columns=["parent", "child", "num"])
-    for bags_rule in bags_rules_text:
-        rule_tokens = bags_rule.split()
-        parent, child_tokens = " ".join(rule_tokens[:2]), rule_tokens[4:]
-        if child_tokens[0] != "no":  # if the bag can contain other bags
-            for child, num in (
-                (" ".join(child_tokens[i + 1 : i + 3]), int(child_tokens[i]))
-                for i in range(0, len(child_tokens), 4)
-            ):
-                bags_rules = bags_rules.append(
-                    {"parent": parent, "child": child, "num": num},
-                    ignore_index=True,
+from typing import Dict, List, Sequence, Set, Tuple
+
+
+class BagsRules:
+    """Graph of the bags' rules, indexed both by the bags' contents and by the bags' containers."""
+
+    def __init__(self):
+        # Forward index: bags (with their number) directly inside each bag
+        self.contents: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        # Reverse index: bags that can directly contain each bag
+        self.containers: Dict[str, List[str]] = defaultdict(list)
+        # Memoized number of bags required inside each bag
+        self.num_child_bags: Dict[str, int] = {}
+
+    def add_rule(self, parent: str, child: str, num: int) -> None:
+        self.contents[parent].append((child, num))
+        self.containers[child].append(parent)
+        self.num_child_bags.clear()
+
+    @classmethod
+    def from_file(cls, bags_rules_path: Path) -> "BagsRules":
+        bags_rules = cls()
+        with open(bags_rules_path) as file:
+            for bags_rule in file:
+                rule_tokens = bags_rule.split()
+                if not rule_tokens:
+                    continue
+                parent, child_tokens = " ".join(rule_tokens[:2]), rule_tokens[4:]
+                if child_tokens[0] != "no":  # if the bag can contain other bags
+                    for i in range(0, len(child_tokens), 4):
+                        bags_rules.add_rule(
+                            parent,
+                            " ".join(child_tokens[i + 1 : i + 3]),
+                            int(child_tokens[i]),
+                        )
+        return bags_rules
+
+
+def can_be_contained_by(bags_rules: BagsRules, color: str) -> Set[str]:
+    parents = set()
+    to_visit = [color]
+    while to_visit:
+        for parent in bags_rules.containers.get(to_visit.pop(), ()):
+            if parent not in parents:
+                parents.add(parent)
+                to_visit.append(parent)
+    return parents
+
+
+def number_of_child_bags(bags_rules: BagsRules, color: str) -> int:
+    num_child_bags = bags_rules.num_child_bags
+    to_visit = [color]
+    # Bags whose childs have been pushed to be counted, but that are not counted themselves yet. Since their childs are
+    # counted first, running into one of these bags again while counting its childs means the rules have a cycle
+    expanded = set()
+    while to_visit:
+        bag = to_visit[-1]
+        if bag in num_child_bags:
+            to_visit.pop()
+            continue
+        childs = bags_rules.contents.get(bag, ())
+        childs_to_count = [child for child, _ in childs if child not in num_child_bags]
+        if childs_to_count:  # Count the bags inside the childs before the bag itself
+            if cycle_bags := expanded.intersection(childs_to_count):
+                raise RuntimeError(
+                    f"The bags' rules contain a cycle through the '{bag}' and {cycle_bags} bags."
                 )
+            expanded.add(bag)
+            to_visit.extend(childs_to_count)
+        else:
+            num_child_bags[bag] = sum(
+                child_count * (1 + num_child_bags[child])
+                for child, child_count in childs
+            )
+            to_visit.pop()
+    return num_child_bags[color]
 
-    shiny_gold_bag_parents = can_be_contained_by(bags_rules, "shiny gold")
-    print(
-        f"{len(shiny_gold_bag_parents)} bag colors can eventually contain at least one shiny gold bag."
-    )
 
-    child_bags = number_of_child_bags(bags_rules, "shiny gold")
-    print(
-        f"{child_bags} individual bags are required inside your single shiny gold bag."
-    )
+def topological_order(bags_rules: BagsRules) -> List[str]:
+    """Sorts the bags so that every bag comes before the bags it can contain (Kahn's algorithm)."""
+    bags = set(bags_rules.contents).union(bags_rules.containers)
+    num_containers = {bag: len(bags_rules.containers.get(bag, ())) for bag in bags}
+    to_visit = deque(bag for bag, num in num_containers.items() if not num)
+    order = []
+    while to_visit:
+        bag = to_visit.popleft()
+        order.append(bag)
+        for child, _ in bags_rules.contents.get(bag, ()):
+            num_containers[child] -= 1
+            if not num_containers[child]:
+                to_visit.append(child)
+
+    if len(order) != len(bags):
+        # Bags that were never freed of their containers are either on a cycle, or inside a bag on a cycle
+        cycle_bags = sorted(bag for bag, num in num_containers.items() if num)
+        raise RuntimeError(
+            f"The bags' rules contain a cycle, involving some of these bags: {cycle_bags}."
+        )
+    return order
+
+
+class BagsIndex:
+    """Precomputed answers to the questions about every bag, computed in topological order of the bags' rules.
+
+    The bags that can eventually contain each bag are stored as a bitset over the bags' topological ranks, so that
+    the transitive closure of the containers is computed with one OR per rule.
+    """
+
+    def __init__(self, bags_rules: BagsRules):
+        self.bags = topological_order(bags_rules)
+        self.ranks = {bag: rank for rank, bag in enumerate(self.bags)}
+
+        # Containers are ranked before the bags they contain, so they are complete by the time we reach a bag
+        self.ancestors: Dict[str, int] = {}
+        for bag in self.bags:
+            ancestors = 0
+            for parent in bags_rules.containers.get(bag, ()):
+                ancestors |= self.ancestors[parent] | (1 << self.ranks[parent])
+            self.ancestors[bag] = ancestors
+
+        # Contents are ranked after the bags containing them, so count bags in reverse order
+        self.num_child_bags: Dict[str, int] = {}
+        for bag in reversed(self.bags):
+            self.num_child_bags[bag] = sum(
+                child_count * (1 + self.num_child_bags[child])
+                for child, child_count in bags_rules.contents.get(bag, ())
+            )
+
+    def num_containers(self, color: str) -> int:
+        return self.ancestors.get(color, 0).bit_count()
+
+    def can_be_contained_by(self, color: str) -> Set[str]:
+        ancestors = self.ancestors.get(color, 0)
+        return {bag for rank, bag in enumerate(self.bags) if ancestors >> rank & 1}
+
+
+def bags_rules(bags_rules_path: Path, colors: Sequence[str], batch: bool) -> None:
+    bags_rules = BagsRules.from_file(bags_rules_path)
+
+    if batch:
+        bags_index = BagsIndex(bags_rules)
+        num_containers_fn = bags_index.num_containers
+        num_child_bags_fn = bags_index.num_child_bags.get
+    else:
+        num_containers_fn = lambda color: len(can_be_contained_by(bags_rules, color))
+        num_child_bags_fn = lambda color: number_of_child_bags(bags_rules, color)
+
+    for color in colors:
+        print(
+            f"{num_containers_fn(color)} bag colors can eventually contain at least one {color} bag."
+        )
+        print(
+            f"{num_child_bags_fn(color) or 0} individual bags are required inside your single {color} bag."
+        )
 
 
 if __name__ == "__main__":
@@ -58,5 +165,17 @@ if __name__ == "__main__":
         type=Path,
         help="The path to the bags' rules data file to read",
     )
+    parser.add_argument(
+        "--colors",
+        type=str,
+        nargs="+",
+        default=["shiny gold"],
+        help="The colors of the bags about which to answer",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Whether to precompute the answers for all colors at once, in a single pass over the rules",
+    )
     args = parser.parse_args()
-    bags_rules(args.bags_rules_path)
+    bags_rules(args.bags_rules_path, args.colors, args.batch)
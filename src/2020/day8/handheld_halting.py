@@ -1,11 +1,37 @@
-from copy import deepcopy
+import time
+from array import array
+from collections import Counter, deque
 from pathlib import Path
-from typing import Callable, List, Tuple
-
-from tqdm import tqdm
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 Code = List[Tuple[str, int]]
 ExitCode = Tuple[bool, int]
+# Index of the instruction to edit, its new op, and the final value of the accumulator
+Repair = Tuple[int, str, int]
+
+switched_ops = {"jmp": "nop", "nop": "jmp"}
+opcodes = {"acc": 0, "jmp": 1, "nop": 2}
+
+
+class CompiledCode(NamedTuple):
+    """Program compiled to integer arrays, where each instruction is reduced to its effects on the VM's state."""
+
+    ops: array  # Opcode of each instruction
+    acc_increments: array  # Increment of the accumulator by each instruction
+    next_instructions: array  # Index of the instruction executed after each instruction
+
+
+class VMProfile:
+    """Counters filled by `run_compiled_code` to profile the execution of a program."""
+
+    def __init__(self):
+        self.num_steps = 0
+        self.elapsed_time = 0.0
+        self.op_counts = Counter()
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.num_steps / max(self.elapsed_time, 1e-9)
 
 
 def run_code(code: Code) -> ExitCode:
@@ -32,50 +58,159 @@ def run_code(code: Code) -> ExitCode:
     return next_instruction_idx == len(code), acc
 
 
-def edit_instruction(code: Code, target_instruction: int, target_op: str) -> Code:
-    code_copy = deepcopy(code)
-    code_copy[target_instruction] = (target_op, code[target_instruction][1])
-    return code_copy
+def next_instruction(op: str, arg: int, instruction_idx: int) -> int:
+    return instruction_idx + (arg if op == "jmp" else 1)
 
 
-def repair_code(code: Code) -> ExitCode:
-    # Identify instructions that might have been corrupted (any jmp or nop in the code)
-    jumps_to_edit = [
-        idx for idx, instruction in enumerate(code) if instruction[0] == "jmp"
-    ]
-    nops_to_edit = [
-        idx for idx, instruction in enumerate(code) if instruction[0] == "nop"
-    ]
-    target_ops = (["nop"] * len(jumps_to_edit)) + (["jmp"] * len(nops_to_edit))
-
-    # Brute force code repair by trying to switch every possibly corrupted instruction
-    has_program_terminated_correctly = False
-    pbar = tqdm(jumps_to_edit + nops_to_edit, unit="instruction")
-    for instruction_to_edit, target_op in zip(pbar, target_ops):
-        pbar.set_description(
-            f"Running code with instruction {instruction_to_edit} op switched to '{target_op}'"
-        )
-        has_program_terminated_correctly, acc = run_code(
-            edit_instruction(code, instruction_to_edit, target_op)
+def compile_code(code: Code) -> CompiledCode:
+    if unknown_ops := {op for op, _ in code}.difference(opcodes):
+        raise RuntimeError(f"Unknown instruction types: {unknown_ops}.")
+    return CompiledCode(
+        array("B", [opcodes[op] for op, _ in code]),
+        array("q", [arg if op == "acc" else 0 for op, arg in code]),
+        array(
+            "q",
+            [
+                next_instruction(op, arg, instruction_idx)
+                for instruction_idx, (op, arg) in enumerate(code)
+            ],
+        ),
+    )
+
+
+def run_compiled_code(
+    compiled_code: CompiledCode,
+    max_steps: Optional[int] = None,
+    profile: Optional[VMProfile] = None,
+) -> ExitCode:
+    """Runs a compiled program until it terminates, loops, or exceeds a maximum number of steps.
+
+    Since the instructions' effects are precomputed, each step is reduced to a few array lookups, without any dispatch
+    on the instruction's op. Jumping outside the program (before its first instruction or after its end) terminates
+    the program incorrectly.
+
+    Args:
+        compiled_code: Compiled program to run.
+        max_steps: Maximum number of instructions to execute. The program is considered to not have terminated
+            correctly if it reaches this limit.
+        profile: Counters to fill with the number of steps, the execution time and the number of executions per op.
+
+    Returns:
+        Whether the program terminated correctly, and the value of the accumulator at the end of the execution.
+    """
+    acc_increments, next_instructions = (
+        compiled_code.acc_increments,
+        compiled_code.next_instructions,
+    )
+    num_instructions = len(next_instructions)
+    max_steps = num_instructions if max_steps is None else max_steps
+    executed_instructions = bytearray(num_instructions)
+
+    start_time = time.perf_counter()
+    instruction_idx, acc, num_steps = 0, 0, 0
+    while (
+        0 <= instruction_idx < num_instructions
+        and not executed_instructions[instruction_idx]
+        and num_steps < max_steps
+    ):
+        executed_instructions[instruction_idx] = 1
+        acc += acc_increments[instruction_idx]
+        instruction_idx = next_instructions[instruction_idx]
+        num_steps += 1
+
+    if profile is not None:
+        profile.num_steps += num_steps
+        profile.elapsed_time += time.perf_counter() - start_time
+        # Each instruction is executed at most once, so counting executed ops can be done after the fact
+        ops = {opcode: op for op, opcode in opcodes.items()}
+        profile.op_counts.update(
+            ops[opcode]
+            for opcode, executed in zip(compiled_code.ops, executed_instructions)
+            if executed
         )
-        if has_program_terminated_correctly:
+
+    return instruction_idx == num_instructions, acc
+
+
+def find_repairs(code: Code) -> List[Repair]:
+    """Finds every single jmp/nop switch that makes the program terminate, in linear time.
+
+    The instructions from which the unmodified program terminates are found by walking back the program's control
+    flow from its end. Then, the unmodified program is run once, and switching one of the instructions it executes
+    repairs the program if the switched instruction jumps to an instruction from which the program terminates.
+
+    Args:
+        code: Program to repair, that runs into an infinite loop.
+
+    Returns:
+        Every possible repair, in the order in which the switched instructions are executed.
+    """
+    # Invert the control flow, ignoring jumps out of the program since they don't terminate it correctly
+    previous_instructions = [[] for _ in range(len(code) + 1)]
+    for instruction_idx, (op, arg) in enumerate(code):
+        if 0 <= (next_idx := next_instruction(op, arg, instruction_idx)) <= len(code):
+            previous_instructions[next_idx].append(instruction_idx)
+
+    # Walk back from the end to find the instructions leading to it, with the accumulator's increment along the way
+    acc_to_end = {len(code): 0}
+    to_visit = deque([len(code)])
+    while to_visit:
+        instruction_idx = to_visit.popleft()
+        for previous_idx in previous_instructions[instruction_idx]:
+            op, arg = code[previous_idx]
+            acc_to_end[previous_idx] = acc_to_end[instruction_idx] + (
+                arg if op == "acc" else 0
+            )
+            to_visit.append(previous_idx)
+
+    if 0 in acc_to_end:
+        raise RuntimeError("The program already terminates correctly.")
+
+    # Run the program, checking whether switching each executed instruction would lead it to the end instead. Since
+    # the unmodified program loops, none of the executed instructions lead to the end, so after the switch the program
+    # can't come back to the switched instruction on its way to the end
+    repairs = []
+    instruction_idx, acc = 0, 0
+    executed_instructions = set()
+    while 0 <= instruction_idx < len(code):
+        if instruction_idx in executed_instructions:
             break
+        executed_instructions.add(instruction_idx)
+        op, arg = code[instruction_idx]
+        if op in switched_ops:
+            switched_op = switched_ops[op]
+            switched_next_idx = next_instruction(switched_op, arg, instruction_idx)
+            if switched_next_idx in acc_to_end:
+                repairs.append(
+                    (instruction_idx, switched_op, acc + acc_to_end[switched_next_idx])
+                )
+        elif op == "acc":
+            acc += arg
+        else:
+            raise RuntimeError(f"Unknown instruction type: {op}.")
+        instruction_idx = next_instruction(op, arg, instruction_idx)
+
+    return repairs
 
-    if not has_program_terminated_correctly:
+
+def repair_code(code: Code) -> ExitCode:
+    if not (repairs := find_repairs(code)):
         raise RuntimeError(
             "Could not find an instruction to edit that allowed for the program to terminate correctly."
         )
-    else:
-        return True, acc
+    _, _, acc = repairs[0]
+    return True, acc
 
 
-def handheld_halting(boot_code_path: Path, run_fn: Callable[[Code], ExitCode]) -> None:
+def read_boot_code(boot_code_path: Path) -> Code:
     with open(boot_code_path) as file:
-        boot_code_instructions = [
+        return [
             (line.split()[0], int(line.split()[1])) for line in file.read().splitlines()
         ]
 
-    has_program_terminated_correctly, acc = run_fn(boot_code_instructions)
+
+def handheld_halting(boot_code_path: Path, run_fn: Callable[[Code], ExitCode]) -> None:
+    has_program_terminated_correctly, acc = run_fn(read_boot_code(boot_code_path))
 
     if has_program_terminated_correctly:
         msg = "The program terminated correctly, "
@@ -95,5 +230,41 @@ if __name__ == "__main__":
         help="The path to the boot code instructions file to read",
     )
     parser.add_argument("run_mode", type=str, choices=["run", "repair"])
+    parser.add_argument(
+        "--compiled",
+        action="store_true",
+        help="In 'run' mode, whether to compile the program before running it, and profile its execution",
+    )
+    parser.add_argument(
+        "--max_steps",
+        type=int,
+        help="In 'run' mode with a compiled program, the maximum number of instructions to execute",
+    )
+    parser.add_argument(
+        "--all_repairs",
+        action="store_true",
+        help="In 'repair' mode, whether to list every instruction that can be edited to repair the program",
+    )
     args = parser.parse_args()
-    handheld_halting(args.boot_code_path, globals()[f"{args.run_mode}_code"])
+    if args.run_mode == "repair" and args.all_repairs:
+        for instruction_idx, switched_op, acc in find_repairs(
+            read_boot_code(args.boot_code_path)
+        ):
+            print(
+                f"Switching instruction {instruction_idx} op to '{switched_op}' makes the program terminate correctly, "
+                f"with a value of {acc} in the accumulator."
+            )
+    elif args.run_mode == "run" and args.compiled:
+        vm_profile = VMProfile()
+        handheld_halting(
+            args.boot_code_path,
+            lambda code: run_compiled_code(
+                compile_code(code), max_steps=args.max_steps, profile=vm_profile
+            ),
+        )
+        print(
+            f"Executed {vm_profile.num_steps} instructions ({dict(vm_profile.op_counts)}) "
+            f"at {vm_profile.instructions_per_second:.0f} instructions/s."
+        )
+    else:
+        handheld_halting(args.boot_code_path, globals()[f"{args.run_mode}_code"])
@@ -1,57 +1,191 @@
+import bisect
 import itertools
+import typing
+from collections import Counter, defaultdict, deque
 from pathlib import Path
-from typing import Sequence
+from typing import Iterable, Iterator, Sequence, TextIO, Tuple
 
+# First and last (inclusive) indices of a contiguous range in the data, and the minimum and maximum in the range
+WeaknessRange = Tuple[int, int, int, int]
 
-def is_number_valid(number: int, preamble: Sequence[int]) -> bool:
+
+def is_number_valid(number: int, preamble: typing.Counter[int]) -> bool:
+    # Look for the complement of each distinct number in the preamble, which can be the number itself only if it
+    # appears more than once in the preamble
     return any(
-        number == sum(combination)
-        for combination in itertools.combinations(preamble, 2)
+        (complement := number - term) in preamble
+        and (complement != term or preamble[term] > 1)
+        for term in preamble
     )
 
 
+def find_invalid_numbers(
+    port_data: Iterable[int], preamble_length: int
+) -> Iterator[Tuple[int, int]]:
+    """Scans the port's data, yielding the numbers that are not the sum of two of the numbers in their preamble.
+
+    The preamble is a sliding window over the data, whose counts are updated as numbers enter and leave it, so that
+    each number is checked in O(preamble_length) and the data can be consumed as a stream.
+
+    Args:
+        port_data: Numbers in the port's data.
+        preamble_length: Number of previous numbers that make up the preamble of a number.
+
+    Returns:
+        Iterator over the index and value of the invalid numbers.
+    """
+    window = deque()
+    preamble = Counter()
+    for number_idx, number in enumerate(port_data):
+        if len(window) == preamble_length:
+            if not is_number_valid(number, preamble):
+                yield number_idx, number
+            oldest = window.popleft()
+            preamble[oldest] -= 1
+            if not preamble[oldest]:
+                del preamble[oldest]
+        window.append(number)
+        preamble[number] += 1
+
+
+def read_port_data(file: TextIO) -> Iterator[int]:
+    return (int(line) for line in file if line.strip())
+
+
+def find_weakness_ranges_two_pointers(
+    port_data: Sequence[int], target: int
+) -> Iterator[WeaknessRange]:
+    """Finds the contiguous ranges of at least two numbers that sum to the target, for non-negative data.
+
+    Since the data is non-negative, the sum of a window only grows when extending its end and only shrinks when
+    advancing its start, so a single sweep of both ends finds all the ranges in O(n). The minimum and maximum of the
+    window are maintained with monotonic deques of indices, so the ranges are never copied.
+    """
+    start, window_sum = 0, 0
+    min_idx, max_idx = deque(), deque()
+    for end, number in enumerate(port_data):
+        window_sum += number
+        while min_idx and port_data[min_idx[-1]] >= number:
+            min_idx.pop()
+        min_idx.append(end)
+        while max_idx and port_data[max_idx[-1]] <= number:
+            max_idx.pop()
+        max_idx.append(end)
+
+        while window_sum > target and start < end:
+            window_sum -= port_data[start]
+            start += 1
+            if min_idx[0] < start:
+                min_idx.popleft()
+            if max_idx[0] < start:
+                max_idx.popleft()
+
+        if window_sum == target:
+            # Zeros at the beginning of the window can be dropped without changing its sum
+            range_start = start
+            while range_start < end and (
+                range_start == start or port_data[range_start - 1] == 0
+            ):
+                yield (
+                    range_start,
+                    end,
+                    next(port_data[idx] for idx in min_idx if idx >= range_start),
+                    next(port_data[idx] for idx in max_idx if idx >= range_start),
+                )
+                range_start += 1
+
+
+def find_weakness_ranges_prefix_sums(
+    port_data: Sequence[int], target: int
+) -> Iterator[WeaknessRange]:
+    """Finds the contiguous ranges of at least two numbers that sum to the target, for data of any sign.
+
+    The ranges ending at a number are those starting after an earlier prefix sum equal to the current prefix sum minus
+    the target, which are looked up in a hash table of the prefix sums seen so far. Since the ranges can start anywhere,
+    the monotonic stacks of indices are never trimmed from the front: the minimum (resp. maximum) of a range is at the
+    first index in the stack that is not before the range's start, found by bisection.
+    """
+    prefix_sums_idx = defaultdict(list)
+    prefix_sum, previous_prefix_sum = 0, None
+    min_idx, max_idx = [], []
+    for end, number in enumerate(port_data):
+        while min_idx and port_data[min_idx[-1]] >= number:
+            min_idx.pop()
+        min_idx.append(end)
+        while max_idx and port_data[max_idx[-1]] <= number:
+            max_idx.pop()
+        max_idx.append(end)
+
+        # Only make the prefix sum before the previous number available, so that ranges have at least two numbers
+        if previous_prefix_sum is not None:
+            prefix_sums_idx[previous_prefix_sum].append(end - 1)
+        previous_prefix_sum = prefix_sum
+        prefix_sum += number
+        for start in prefix_sums_idx.get(prefix_sum - target, ()):
+            yield (
+                start,
+                end,
+                port_data[min_idx[bisect.bisect_left(min_idx, start)]],
+                port_data[max_idx[bisect.bisect_left(max_idx, start)]],
+            )
+
+
+def find_weakness_ranges(
+    port_data: Sequence[int], target: int
+) -> Iterator[WeaknessRange]:
+    if all(number >= 0 for number in port_data):
+        return find_weakness_ranges_two_pointers(port_data, target)
+    return find_weakness_ranges_prefix_sums(port_data, target)
+
+
 def compute_encryption_weakness(port_data: Sequence[int], invalid_number: int) -> int:
     # Find the range that sums to the invalid number
-    weakness_ranges = [
-        port_data[i : j + 1]
-        for i in range(len(port_data))
-        for j in range(i + 1, len(port_data))
-        if sum(port_data[i : j + 1]) == invalid_number
-    ]
+    weakness_ranges = list(
+        itertools.islice(find_weakness_ranges(port_data, invalid_number), 2)
+    )
+    if not weakness_ranges:
+        raise RuntimeError("Found no range that sums to the XMAS invalid number.")
     if len(weakness_ranges) > 1:
         raise RuntimeError(
-            "Found more than one range that sums to the XMAS invalid number:",
-            "\n".join(weakness_ranges),
+            "Found more than one range that sums to the XMAS invalid number, e.g. ranges "
+            + " and ".join(f"[{start}, {end}]" for start, end, _, _ in weakness_ranges)
+            + "."
         )
-    weakness_range = weakness_ranges[0]
 
     # Computes the encryption weakness from the range
-    return min(weakness_range) + max(weakness_range)
+    _, _, range_min, range_max = weakness_ranges[0]
+    return range_min + range_max
 
 
 def encoding_error(
-    port_data_path: Path,
+    port_data_path: Path, preamble_length: int, all_ranges: bool
 ) -> None:
     with open(port_data_path) as file:
-        port_data = [int(line) for line in file.read().splitlines()]
-
-    preamble_length = 25
-    number_idx = preamble_length
-    while is_number_valid(
-        port_data[number_idx], port_data[number_idx - preamble_length : number_idx]
-    ):
-        number_idx += 1
+        _, invalid_number = next(
+            find_invalid_numbers(read_port_data(file), preamble_length), (None, None)
+        )
 
-    if number_idx == len(port_data):
+    if invalid_number is None:
         raise RuntimeError(
             "Finished scanning all data from the port without finding any invalid numbers."
         )
-    print(f"{port_data[number_idx]} is the first invalid number in the port's data.")
+    print(f"{invalid_number} is the first invalid number in the port's data.")
 
-    encryption_weakness = compute_encryption_weakness(port_data, port_data[number_idx])
-    print(
-        f"The encryption weakness in the XMAS-encrypted list of numbers is {encryption_weakness}."
-    )
+    with open(port_data_path) as file:
+        port_data = list(read_port_data(file))
+    if all_ranges:
+        for start, end, range_min, range_max in find_weakness_ranges(
+            port_data, invalid_number
+        ):
+            print(
+                f"The range [{start}, {end}] sums to the invalid number, "
+                f"for an encryption weakness of {range_min + range_max}."
+            )
+    else:
+        encryption_weakness = compute_encryption_weakness(port_data, invalid_number)
+        print(
+            f"The encryption weakness in the XMAS-encrypted list of numbers is {encryption_weakness}."
+        )
 
 
 if __name__ == "__main__":
@@ -63,5 +197,16 @@ if __name__ == "__main__":
         type=Path,
         help="The path to the port data file to read",
     )
+    parser.add_argument(
+        "--preamble_length",
+        type=int,
+        default=25,
+        help="The number of previous numbers that make up the preamble of a number",
+    )
+    parser.add_argument(
+        "--all_ranges",
+        action="store_true",
+        help="Whether to list all the contiguous ranges that sum to the invalid number",
+    )
     args = parser.parse_args()
-    encoding_error(args.port_data_path)
+    encoding_error(args.port_data_path, args.preamble_length, args.all_ranges)
@@ -0,0 +1,28 @@
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+Chunk = Tuple[int, int]
+
+
+def split_in_chunks(file_path: Path, chunk_size: int) -> List[Chunk]:
+    """Splits a file in byte ranges of roughly `chunk_size` bytes, each ending right after a newline."""
+    file_size = os.path.getsize(file_path)
+    chunks = []
+    with open(file_path, "rb") as file:
+        start = 0
+        while start < file_size:
+            file.seek(min(start + chunk_size, file_size))
+            file.readline()  # Move the end of the chunk up to the end of the line
+            end = file.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def read_chunk_lines(file_path: Path, chunk: Chunk) -> List[str]:
+    """Reads the lines in a byte range of a file, e.g. one produced by `split_in_chunks`."""
+    start, end = chunk
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        return file.read(end - start).decode().splitlines()
@@ -0,0 +1,70 @@
+import time
+from typing import Iterator, List, Optional, TextIO
+
+
+class RecordsCounter:
+    """Throughput counters updated by `read_records`, that can be polled to monitor the progress of a reading."""
+
+    def __init__(self):
+        self.num_records = 0
+        self.num_lines = 0
+        self.start_time = time.perf_counter()
+
+    @property
+    def elapsed_time(self) -> float:
+        """Time (in seconds) elapsed since the counter was created."""
+        return time.perf_counter() - self.start_time
+
+    @property
+    def records_per_second(self) -> float:
+        """Average number of records read per second since the counter was created."""
+        return self.num_records / max(self.elapsed_time, 1e-9)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(num_records={self.num_records}, num_lines={self.num_lines}, "
+            f"records_per_second={self.records_per_second:.1f})"
+        )
+
+
+def read_records(
+    file: TextIO,
+    separator: str = "",
+    buffer_size: int = 1 << 16,
+    counter: Optional[RecordsCounter] = None,
+) -> Iterator[List[str]]:
+    """Reads a file made of records spanning multiple lines, yielding the records one at a time.
+
+    Args:
+        file: File object from which to read the records.
+        separator: Content of the lines that separate records. By default, records are separated by blank lines.
+        buffer_size: Number of characters to read from the file at once.
+        counter: Counters to update with the number of records and lines read.
+
+    Returns:
+        Iterator over the records, as lists of the lines (without line endings) that make up each record. Empty
+        records, e.g. between consecutive separators, are skipped.
+    """
+    record, partial_line = [], ""
+    for buffer in iter(lambda: file.read(buffer_size), ""):
+        lines = (partial_line + buffer).split("\n")
+        partial_line = lines.pop()  # The last line might continue in the next buffer
+        for line in lines:
+            line = line.rstrip("\r")
+            if line == separator:
+                if record:
+                    if counter is not None:
+                        counter.num_records += 1
+                        counter.num_lines += len(record)
+                    yield record
+                record = []
+            else:
+                record.append(line)
+
+    if partial_line and partial_line != separator:
+        record.append(partial_line.rstrip("\r"))
+    if record:
+        if counter is not None:
+            counter.num_records += 1
+            counter.num_lines += len(record)
+        yield record